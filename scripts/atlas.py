@@ -0,0 +1,120 @@
+import json
+import os
+import sys
+import pygame
+from concurrent.futures import ThreadPoolExecutor
+
+VERSION = 1
+ATLAS_WIDTH = 1024
+PADDING = 1
+COLORKEY = (0, 0, 0)
+DECODE_WORKERS = 4
+
+#   A bundle is an atlas image plus a JSON index next to it:
+#   {"version": 1, "sources": {path: mtime}, "frames": {path: [x, y, width, height]}}
+#   Paths are relative to the assets directory. The bundle is rebuilt whenever the set of source images or
+#   any of their modification times changes.
+
+
+def source_files(base_path: str, sources: list) -> dict:
+    ''' Returns {path: mtime} for the listed images and every file inside the listed directories '''
+    files = {}
+    for source in sources:
+        full_path = base_path + source
+        if os.path.isdir(full_path):
+            for img_name in sorted(os.listdir(full_path)):
+                files[source + '/' + img_name] = os.path.getmtime(full_path + '/' + img_name)
+        else:
+            files[source] = os.path.getmtime(full_path)
+    return files
+
+
+def pack(sizes: dict, width: int = ATLAS_WIDTH) -> tuple:
+    ''' Shelf packing: images are placed left to right in rows, tallest first. Returns the {path: (x, y)}
+    positions and the height of the atlas '''
+    positions = {}
+    x = y = shelf_height = 0
+    for path in sorted(sizes, key=lambda path: (-sizes[path][1], path)):
+        img_width, img_height = sizes[path]
+        if x and x + img_width > width:
+            x = 0
+            y += shelf_height + PADDING
+            shelf_height = 0
+        positions[path] = (x, y)
+        x += img_width + PADDING
+        shelf_height = max(shelf_height, img_height)
+    return positions, y + shelf_height
+
+
+def decode(path: str) -> pygame.Surface:
+    ''' Loads an image keeping only its RGB channels '''
+    img = pygame.image.load(path)
+    return pygame.image.frombytes(pygame.image.tobytes(img, 'RGB'), img.get_size(), 'RGB')
+
+
+def build(base_path: str, sources: list, atlas_path: str, index_path: str) -> tuple:
+    ''' Decodes the source images in parallel, packs them into one atlas and writes the bundle. Like 
+    Surface.convert, the alpha channel is dropped and transparency comes from the colorkey. Returns the 
+    (atlas, index) pair, which is still usable when the bundle can not be written '''
+    files = source_files(base_path, sources)
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+        images = dict(zip(files, pool.map(lambda path: decode(base_path + path), files)))
+    positions, height = pack({path: img.get_size() for path, img in images.items()})
+
+    width = max([x + images[path].get_width() for path, (x, _) in positions.items()], default=1)
+    atlas = pygame.Surface((width, max(height, 1)))
+    atlas.fill(COLORKEY)
+    frames = {}
+    for path, pos in positions.items():
+        atlas.blit(images[path], pos)
+        frames[path] = [pos[0], pos[1], images[path].get_width(), images[path].get_height()]
+    index = {'version': VERSION, 'sources': files, 'frames': frames}
+
+    try:
+        pygame.image.save(atlas, atlas_path)
+        with open(index_path, 'w') as f:
+            json.dump(index, f)
+    except (OSError, pygame.error):
+        pass
+    return atlas, index
+
+
+class Atlas:
+    ''' Images of the game sliced as subsurfaces from a cached atlas, so a cold start opens two files instead of
+    one per frame. The bundle is built on first use and whenever a source image changes. '''
+
+    def __init__(self, base_path: str, sources: list, atlas_path: str, index_path: str) -> None:
+        atlas, self.index = self.load_bundle(base_path, sources, atlas_path, index_path)
+        if atlas is None:
+            atlas, self.index = build(base_path, sources, atlas_path, index_path)
+        self.atlas: pygame.Surface = atlas.convert() if pygame.display.get_surface() else atlas
+        self.atlas.set_colorkey(COLORKEY)
+        self.frames: dict = self.index['frames']
+
+    @staticmethod
+    def load_bundle(base_path: str, sources: list, atlas_path: str, index_path: str) -> tuple:
+        ''' Returns the cached (atlas, index) pair, or (None, None) if it is missing or stale '''
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            if index.get('version') != VERSION or index.get('sources') != source_files(base_path, sources):
+                return None, None
+            return pygame.image.load(atlas_path), index
+        except (OSError, ValueError, pygame.error):
+            return None, None
+
+    def image(self, path: str) -> pygame.Surface:
+        ''' Returns the subsurface of a single image '''
+        return self.atlas.subsurface(self.frames[path])
+
+    def images(self, directory: str) -> list[pygame.Surface]:
+        ''' Returns the subsurfaces of every image in a directory, sorted by file name '''
+        paths = sorted(path for path in self.frames if path.rsplit('/', 1)[0] == directory)
+        return [self.image(path) for path in paths]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4:
+        print('usage: python scripts/atlas.py atlas.png atlas.json source [source ...]   (run from assets/)')
+        sys.exit(1)
+    build('', sys.argv[3:], sys.argv[1], sys.argv[2])
@@ -1,31 +1,49 @@
-import random
 import pygame
-from utils import play_sound
+from spatialhash import SpatialHash
+from events import GameEvent
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class Balloon:
     ''' Creates a new Ballon object '''
+    __slots__ = ('pos', 'prev_pos', 'img', 'speed_x', 'speed_y', 'size', 'game', 'alreadycollide', 'box')
+
     def __init__(self, game, pos: tuple, img: str, speed_x: int, speed_y: int, size:int ) -> None:
         self.pos: list(tuple) = list(pos)
+        self.prev_pos: list = list(pos)
         self.img: str = img
         self.speed_x: int = speed_x
         self.speed_y: int = speed_y
         self.size: int = size
         self.game = game
         self.alreadycollide: bool = False
+        self.box: pygame.Rect = pygame.Rect(self.pos[0], self.pos[1], self.size, self.size)
 
     def update(self) -> None:
         ''' Updates the ballon´s position based on speed '''
+        self.prev_pos[0], self.prev_pos[1] = self.pos[0], self.pos[1]
         self.pos[0] += self.speed_x
         self.pos[1] += self.speed_y
 
-    def render(self, surf: pygame.display, offset: tuple =(0,0)) -> None:
-        ''' Renders the ballon on the given surface and position '''
-        surf.blit(self.img, (self.pos[0] - offset[0], self.pos[1] - offset[1]))
+    def relocate(self, x: float, y: float) -> None:
+        ''' Moves the balloon without interpolating from where it was '''
+        self.pos[0], self.pos[1] = x, y
+        self.prev_pos[0], self.prev_pos[1] = x, y
+
+    def render(self, surf: pygame.display, offset: tuple =(0,0), alpha: float =1.0) -> None:
+        ''' Renders the ballon on the given surface and position, alpha of the way from its previous position '''
+        pos_x = self.pos[0] - (self.pos[0] - self.prev_pos[0]) * (1 - alpha)
+        pos_y = self.pos[1] - (self.pos[1] - self.prev_pos[1]) * (1 - alpha)
+        surf.blit(self.img, (pos_x - offset[0], pos_y - offset[1]))
 
     def rect(self) -> pygame.Rect:
-        ''' Returns a pygame Rect representing the balloon´s current position and size'''
-        return pygame.Rect(self.pos[0], self.pos[1], self.size, self.size)
+        ''' Returns a pygame Rect representing the balloon´s current position and size, updated in place'''
+        self.box.update(self.pos[0], self.pos[1], self.size, self.size)
+        return self.box
 
 class Balloons:
     ''' Class used for Ballons collections '''
@@ -42,18 +60,21 @@ class Balloons:
         self.balloons_images: list(pygame.image) = balloons_images
         self.game = game
         self.size: int = size
+        self.grid: SpatialHash = SpatialHash()
         self.balloons: list[Balloon] = self.initialize_ballons(count)
+        for balloon in self.balloons:
+            self.grid.insert(balloon, balloon.rect())
 
        
     
     def initialize_ballons(self, count):
         balloons = []
         for _ in range(count):
-            x = random.randrange(0, self.game.W/2)
-            y = random.randrange(0, self.game.H/2)
-            img = random.choice(self.balloons_images)
-            speed_x = -(random.random() * self.SPEED_FACTOR_X + self.SPEED_FACTOR_X)
-            speed_y = -(random.random() * self.SPEED_FACTOR_X + self.SPEED_FACTOR_Y) 
+            x = self.game.rng.randrange(0, self.game.W/2)
+            y = self.game.rng.randrange(0, self.game.H/2)
+            img = self.game.rng.choice(self.balloons_images)
+            speed_x = -(self.game.rng.random() * self.SPEED_FACTOR_X + self.SPEED_FACTOR_X)
+            speed_y = -(self.game.rng.random() * self.SPEED_FACTOR_X + self.SPEED_FACTOR_Y) 
             
             balloons.append(Balloon(self.game, (x, y), img, speed_x, speed_y, self.size))
         
@@ -69,28 +90,87 @@ class Balloons:
             position_difference = self.game.acrobat.pos[0] - balloon.pos[0]
                         
             if balloon.pos[0] < self.BALLOON_MIN_POSITION or position_difference > self.BALLOON_MAX_POSITION:
-                off_screen = random.randrange(self.OFF_SCREEN_MIN, self.OFF_SCREEN_MAX) 
+                off_screen = self.game.rng.randrange(self.OFF_SCREEN_MIN, self.OFF_SCREEN_MAX) 
                 
-                balloon.pos[0] = balloon.pos[0] + self.game.W/2 + off_screen 
-                balloon.pos[1] = random.randrange(self.MIN_HEIGHT, self.MAX_HEIGHT)
-            
+                balloon.relocate(balloon.pos[0] + self.game.W/2 + off_screen, self.game.rng.randrange(self.MIN_HEIGHT, self.MAX_HEIGHT))
+
+            self.grid.move(balloon, balloon.rect())
 
-    def render(self, surf, offset=(0,0)) -> None:
-        ''' Renders all ballons in the collection on the given surface and position'''
+        self.collect()
+
+    def collect(self) -> None:
+        ''' Queues a BALLOON_COLLECTED event for every balloon touching the acrobat and relocates it '''
+        acrobat_rect = self.game.acrobat.rect()
+        for balloon in self.grid.query(acrobat_rect):
+            if balloon.rect().colliderect(acrobat_rect):
+                self.game.events.append(GameEvent.BALLOON_COLLECTED)
+                off_screen = self.game.rng.randrange(self.OFF_SCREEN_MIN, self.OFF_SCREEN_MAX)             
+                balloon.relocate(balloon.pos[0] + self.game.W/2 + off_screen, self.game.rng.randrange(self.MIN_HEIGHT,self.MAX_HEIGHT))
+                self.grid.move(balloon, balloon.rect())
+
+    def render(self, surf, offset=(0,0), alpha: float =1.0) -> None:
+        ''' Renders all ballons in the collection on the given surface and position, interpolated by alpha'''
         for balloon in self.balloons:           
-            
-            balloon.render(surf, offset)
-            balloon_rect = balloon.rect()
-
-            if balloon_rect.colliderect(self.game.acrobat.rect()):
-                play_sound(self.game, 'balloon')
-                self.increase_points()                    
-                    
-                self.alreadycollide = True  
-                off_screen = random.randrange(self.OFF_SCREEN_MIN, self.OFF_SCREEN_MAX)             
-                balloon.pos[0] = balloon.pos[0] + self.game.W/2 + off_screen  
-                balloon.pos[1] = random.randrange(self.MIN_HEIGHT,self.MAX_HEIGHT)
-
-    def increase_points(self) -> None:
-        ''' Increases points of the score when grabing ballons '''
-        self.game.score += 1
\ No newline at end of file
+            balloon.render(surf, offset, alpha)
+
+
+class BalloonField(Balloons):
+    ''' Balloons collection kept in NumPy arrays (positions, speeds and image indices) so that movement, 
+    respawn and the acrobat overlap are each a single vectorized pass, and drawing is one Surface.blits call.
+    Meant for dense balloon storms '''
+
+    def __init__(self, game, balloons_images, size, count = 20) -> None:
+        self.balloons_images: list(pygame.image) = balloons_images
+        self.game = game
+        self.size: int = size
+        self.rng = np.random.default_rng(self.game.rng.getrandbits(64))
+        self.pos = np.column_stack([self.rng.integers(0, self.game.W // 2, count),
+                                    self.rng.integers(0, self.game.H // 2, count)]).astype(float)
+        self.speed = -np.column_stack([self.rng.random(count) * self.SPEED_FACTOR_X + self.SPEED_FACTOR_X,
+                                       self.rng.random(count) * self.SPEED_FACTOR_X + self.SPEED_FACTOR_Y])
+        self.images = self.rng.integers(0, len(balloons_images), count)
+        self.prev_pos = self.pos.copy()
+
+    @staticmethod
+    def available() -> bool:
+        ''' The balloon field needs NumPy, which is optional '''
+        return np is not None
+
+    def __len__(self) -> int:
+        return len(self.pos)
+
+    def update(self) -> None:
+        ''' Moves every balloon, relocates the ones that fell behind the acrobat and collects the ones touching it '''
+        self.prev_pos[:] = self.pos
+        self.pos += self.speed
+        position_difference = self.game.acrobat.pos[0] - self.pos[:, 0]
+        self.respawn((self.pos[:, 0] < self.BALLOON_MIN_POSITION) | (position_difference > self.BALLOON_MAX_POSITION))
+        self.collect()
+
+    def collect(self) -> None:
+        ''' Queues a BALLOON_COLLECTED event for every balloon touching the acrobat and relocates them '''
+        acrobat_rect = self.game.acrobat.rect()
+        box = np.trunc(self.pos)
+        hits = ((box[:, 0] < acrobat_rect.right) & (acrobat_rect.left < box[:, 0] + self.size) &
+                (box[:, 1] < acrobat_rect.bottom) & (acrobat_rect.top < box[:, 1] + self.size))
+        collected = int(hits.sum())
+        if collected:
+            self.game.events.extend([GameEvent.BALLOON_COLLECTED] * collected)
+            self.respawn(hits)
+
+    def respawn(self, mask) -> None:
+        ''' Relocates the masked balloons off screen ahead, at a random height '''
+        count = int(mask.sum())
+        if count:
+            off_screen = self.rng.integers(self.OFF_SCREEN_MIN, self.OFF_SCREEN_MAX, count)
+            self.pos[mask, 0] += self.game.W/2 + off_screen
+            self.pos[mask, 1] = self.rng.integers(self.MIN_HEIGHT, self.MAX_HEIGHT, count)
+            # relocated balloons are not interpolated from where they were
+            self.prev_pos[mask] = self.pos[mask]
+
+    def render(self, surf, offset=(0,0), alpha: float =1.0) -> None:
+        ''' Renders all ballons in one batch, interpolated by alpha '''
+        images = self.balloons_images
+        pos = self.pos if alpha == 1.0 else self.pos - (self.pos - self.prev_pos) * (1 - alpha)
+        surf.blits([(images[img], (x - offset[0], y - offset[1])) 
+                    for img, (x, y) in zip(self.images.tolist(), pos.tolist())], doreturn=False)
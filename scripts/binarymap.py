@@ -0,0 +1,158 @@
+import json
+import mmap
+import struct
+import sys
+
+MAGIC = b'TRPZ'
+VERSION = 1
+FORMAT_CHUNK_SIZE = 16
+EMPTY_CELL = 0
+
+# magic, version, tile_size, origin chunk x, origin chunk y, chunks wide, chunks high, chunk size, tile types, offgrid tiles
+HEADER = struct.Struct('<4sHHiiIIHHI')
+# tile type name (utf-8, zero padded), variant
+TILE_TYPE = struct.Struct('<16sH')
+MAX_TYPE_NAME = 16
+# tile type index, pixel x, pixel y
+OFFGRID_TILE = struct.Struct('<Hdd')
+
+#   Layout: HEADER | TILE_TYPE * types | OFFGRID_TILE * offgrid | grid
+#   The grid stores one little-endian uint16 per cell, 0 for empty and type index + 1 otherwise.
+#   Cells are stored chunk by chunk (row-major inside a chunk, chunks row-major) so a chunk is one contiguous read.
+
+
+class BinaryMap:
+    ''' Read-only, memory-mapped view of a binary level. Tiles are only decoded when a region is asked for. '''
+
+    def __init__(self, path: str) -> None:
+        self.file = open(path, 'rb')
+        self.data: mmap.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.tile_size, self.origin_x, self.origin_y, self.chunks_wide, self.chunks_high,
+         self.chunk_size, type_count, self.offgrid_count) = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{path} is not a version {VERSION} binary map')
+
+        offset = HEADER.size
+        self.tile_types: list = []
+        for _ in range(type_count):
+            name, variant = TILE_TYPE.unpack_from(self.data, offset)
+            self.tile_types.append((name.rstrip(b'\0').decode('utf-8'), variant))
+            offset += TILE_TYPE.size
+        self.offgrid_offset: int = offset
+        self.grid_offset: int = offset + self.offgrid_count * OFFGRID_TILE.size
+        self.chunk_cells: struct.Struct = struct.Struct('<%dH' % (self.chunk_size * self.chunk_size))
+
+    def close(self) -> None:
+        ''' Releases the memory map and the underlying file. '''
+        self.data.close()
+        self.file.close()
+
+    def bounds(self) -> tuple:
+        ''' Returns the (first_x, first_y, last_x, last_y) tile coordinates covered by the grid, end exclusive. '''
+        return (self.origin_x * self.chunk_size, self.origin_y * self.chunk_size,
+                (self.origin_x + self.chunks_wide) * self.chunk_size, (self.origin_y + self.chunks_high) * self.chunk_size)
+
+    def offgrid_tiles(self) -> list:
+        ''' Decodes the offgrid tiles, which are stored in pixels like in map.json. '''
+        tiles = []
+        for i in range(self.offgrid_count):
+            type_index, x, y = OFFGRID_TILE.unpack_from(self.data, self.offgrid_offset + i * OFFGRID_TILE.size)
+            tile_type, variant = self.tile_types[type_index]
+            tiles.append({'type': tile_type, 'variant': variant, 'pos': [x, y]})
+        return tiles
+
+    def chunk_offset(self, chunk_x: int, chunk_y: int) -> int:
+        ''' Returns the byte offset of a stored chunk, or None if it is outside of the grid. '''
+        column = chunk_x - self.origin_x
+        row = chunk_y - self.origin_y
+        if 0 <= column < self.chunks_wide and 0 <= row < self.chunks_high:
+            return self.grid_offset + (row * self.chunks_wide + column) * self.chunk_cells.size
+        return None
+
+    def tiles_in(self, first_x: int, first_y: int, last_x: int, last_y: int) -> list:
+        ''' Decodes the ongrid tiles with first <= pos < last, in the same dict shape Tilemap.save writes. '''
+        tiles = []
+        size = self.chunk_size
+        for chunk_y in range(first_y // size, (last_y - 1) // size + 1):
+            for chunk_x in range(first_x // size, (last_x - 1) // size + 1):
+                offset = self.chunk_offset(chunk_x, chunk_y)
+                if offset is None:
+                    continue
+                for i, cell in enumerate(self.chunk_cells.unpack_from(self.data, offset)):
+                    if cell == EMPTY_CELL:
+                        continue
+                    x = chunk_x * size + i % size
+                    y = chunk_y * size + i // size
+                    if first_x <= x < last_x and first_y <= y < last_y:
+                        tile_type, variant = self.tile_types[cell - 1]
+                        tiles.append({'type': tile_type, 'variant': variant, 'pos': [x, y]})
+        return tiles
+
+    def find(self, id_pairs: list) -> list:
+        ''' Returns the (x, y) tile locations of every ongrid tile whose (type, variant) is in id_pairs.
+        The grid is searched with mmap.find, so nothing but the matches is decoded. '''
+        locations = []
+        size = self.chunk_size
+        cells_per_chunk = size * size
+        for type_index, tile_type in enumerate(self.tile_types):
+            if tile_type not in id_pairs:
+                continue
+            needle = struct.pack('<H', type_index + 1)
+            found = self.data.find(needle, self.grid_offset)
+            while found != -1:
+                if (found - self.grid_offset) % 2 == 0:
+                    cell = (found - self.grid_offset) // 2
+                    chunk, i = divmod(cell, cells_per_chunk)
+                    row, column = divmod(chunk, self.chunks_wide)
+                    locations.append(((self.origin_x + column) * size + i % size, (self.origin_y + row) * size + i // size))
+                    found = self.data.find(needle, found + 2)
+                else:
+                    found = self.data.find(needle, found + 1)
+        return locations
+
+
+def convert(json_path: str, binary_path: str, chunk_size: int = FORMAT_CHUNK_SIZE) -> None:
+    ''' Converts a map written by Tilemap.save into the binary format. Raises ValueError if a tile type name 
+    does not fit in MAX_TYPE_NAME bytes. '''
+    with open(json_path, 'r') as f:
+        map_data = json.load(f)
+    ongrid = list(map_data['tilemap'].values())
+    offgrid = map_data['offgrid']
+
+    tile_types = sorted({(tile['type'], tile['variant']) for tile in ongrid + offgrid})
+    for tile_type, _ in tile_types:
+        if len(tile_type.encode('utf-8')) > MAX_TYPE_NAME:
+            raise ValueError(f'tile type {tile_type!r} is longer than {MAX_TYPE_NAME} bytes and can not be stored in a binary map')
+    type_indices = {tile_type: i for i, tile_type in enumerate(tile_types)}
+
+    if ongrid:
+        origin_x = min(int(tile['pos'][0]) for tile in ongrid) // chunk_size
+        origin_y = min(int(tile['pos'][1]) for tile in ongrid) // chunk_size
+        chunks_wide = max(int(tile['pos'][0]) for tile in ongrid) // chunk_size - origin_x + 1
+        chunks_high = max(int(tile['pos'][1]) for tile in ongrid) // chunk_size - origin_y + 1
+    else:
+        origin_x = origin_y = chunks_wide = chunks_high = 0
+
+    cells_per_chunk = chunk_size * chunk_size
+    grid = [EMPTY_CELL] * (chunks_wide * chunks_high * cells_per_chunk)
+    for tile in ongrid:
+        x, y = int(tile['pos'][0]), int(tile['pos'][1])
+        chunk = (y // chunk_size - origin_y) * chunks_wide + (x // chunk_size - origin_x)
+        grid[chunk * cells_per_chunk + (y % chunk_size) * chunk_size + x % chunk_size] = type_indices[(tile['type'], tile['variant'])] + 1
+
+    with open(binary_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, map_data['tile_size'], origin_x, origin_y, chunks_wide, chunks_high,
+                            chunk_size, len(tile_types), len(offgrid)))
+        for tile_type, variant in tile_types:
+            f.write(TILE_TYPE.pack(tile_type.encode('utf-8'), variant))
+        for tile in offgrid:
+            f.write(OFFGRID_TILE.pack(type_indices[(tile['type'], tile['variant'])], tile['pos'][0], tile['pos'][1]))
+        f.write(struct.pack('<%dH' % len(grid), *grid))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('usage: python scripts/binarymap.py map.json map.bin')
+        sys.exit(1)
+    convert(sys.argv[1], sys.argv[2])
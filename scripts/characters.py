@@ -0,0 +1,192 @@
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from entity import Character, Entity
+from tilemap import CHUNK_SIZE
+from utils import SharedAnimation
+
+
+class Characters:
+    ''' Class used for Character collections. Keeps the state of every clown and monkey in NumPy arrays and
+    advances them all at once, following the same walking, flipping and collision rules as Character.update.
+    Positions and flips are copied back to the Character objects so rendering and the player´s collision 
+    checks keep working on them. Animations that are not shared timelines are still updated one by one.
+    Characters outside of the area passed to update stay dormant until they are inside it again. Characters are assumed to be at most one tile wide and tall. '''
+
+    def __init__(self, game) -> None:
+        self.game = game
+        self.characters: list[Character] = []
+        self.pending: list[Character] = []
+        self.animations: list = []
+        self.rng = np.random.default_rng(game.rng.getrandbits(64))
+        self.pos = np.zeros((0, 2))
+        self.velocity = np.zeros((0, 2))
+        self.size = np.zeros((0, 2), dtype=np.int64)
+        self.flip = np.zeros(0, dtype=bool)
+        self.walking = np.zeros(0, dtype=np.int64)
+        self.collide_x = np.zeros(0, dtype=bool)
+        self.solid = np.zeros((0, 0), dtype=bool)
+        self.solid_origin: tuple = (0, 0)
+        self.solid_version: int = -1
+
+    @staticmethod
+    def available() -> bool:
+        ''' The batched simulation needs NumPy, which is optional '''
+        return np is not None
+
+    def add(self, character: Character) -> None:
+        ''' Registers a character, its state is moved into the arrays on the next update '''
+        self.pending.append(character)
+
+    def __len__(self) -> int:
+        return len(self.characters) + len(self.pending)
+
+    def flush_pending(self) -> None:
+        ''' Appends the state of the characters added since the last update to the arrays '''
+        new = self.pending
+        self.pending = []
+        self.characters.extend(new)
+        self.pos = np.concatenate([self.pos, np.array([c.pos for c in new], dtype=float).reshape(-1, 2)])
+        self.velocity = np.concatenate([self.velocity, np.array([c.velocity for c in new], dtype=float).reshape(-1, 2)])
+        self.size = np.concatenate([self.size, np.array([c.size for c in new], dtype=np.int64).reshape(-1, 2)])
+        self.flip = np.concatenate([self.flip, np.array([c.flip for c in new], dtype=bool)])
+        self.walking = np.concatenate([self.walking, np.array([c.walking for c in new], dtype=np.int64)])
+        self.collide_x = np.concatenate([self.collide_x, np.array([c.is_colliding_horizontally() for c in new], dtype=bool)])
+        self.animations.extend(None if isinstance(c.animation, SharedAnimation) else c.animation for c in new)
+
+    def update(self, tilemap, area: pygame.Rect =None) -> list:
+        ''' Advances every character inside area (all of them by default) one frame, the batched equivalent of 
+        Character.update. Only the rows of those characters are gathered and simulated, the others are not
+        touched and cost nothing but the area test. Returns the characters that were advanced '''
+        if self.pending:
+            self.flush_pending()
+        active = self.active_mask(area)
+        indices = np.flatnonzero(active)
+        if not indices.size:
+            return []
+        self.load_solid_grid(tilemap, active)
+        tile_size = tilemap.tile_size
+
+        pos = self.pos[indices]
+        velocity = self.velocity[indices]
+        size = self.size[indices]
+        flip = self.flip[indices]
+        walking = self.walking[indices]
+
+        movement_x, flip, walking = self.determine_movement(pos, size, flip, walking, self.collide_x[indices], tile_size)
+        frame_movement_x = movement_x + velocity[:, 0]
+        frame_movement_y = velocity[:, 1]
+
+        left, right = self.move_axis(0, pos, size, frame_movement_x, tile_size)
+        top, bottom = self.move_axis(1, pos, size, frame_movement_y, tile_size)
+
+        flip = np.where(movement_x > 0, False, np.where(movement_x < 0, True, flip))
+        velocity[:, 1] += Entity.GRAVITY
+        velocity[:, 1] = np.where(bottom | top, 0, velocity[:, 1])
+
+        self.pos[indices] = pos
+        self.velocity[indices] = velocity
+        self.flip[indices] = flip
+        self.walking[indices] = walking
+        self.collide_x[indices] = left | right
+        return self.write_back(indices)
+
+    def active_mask(self, area: pygame.Rect):
+        ''' Returns which characters overlap area, all of them when there is no area '''
+        if area is None:
+            return np.ones(len(self.characters), dtype=bool)
+        x = self.pos[:, 0]
+        y = self.pos[:, 1]
+        return (x + self.size[:, 0] > area.left) & (x < area.right) & (y + self.size[:, 1] > area.top) & (y < area.bottom)
+
+    def determine_movement(self, pos, size, flip, walking, collide_x, tile_size: int) -> tuple:
+        ''' Batched Character.determine_movement on the gathered rows: walking characters probe the ground ahead
+        and flip at edges or walls, idle ones randomly start walking. Returns (movement_x, flip, walking) '''
+        is_walking = walking > 0
+        direction = np.where(flip, -1, 1)
+        probe_x = np.trunc(pos[:, 0]).astype(np.int64) + size[:, 0] // 2 + Character.FLIP_CHECK_OFFSET_X * direction
+        probe_y = np.floor((pos[:, 1] + Character.GROUND_CHECK_Y_OFFSET) / tile_size).astype(np.int64)
+        can_walk = self.solid_at(probe_x // tile_size, probe_y) & ~collide_x
+
+        movement_x = np.where(is_walking & can_walk, Character.WALKING_SPEED_ADJUSTMENT * direction, 0.0)
+        flip = flip ^ (is_walking & ~can_walk)
+
+        count = len(walking)
+        starts = ~is_walking & (self.rng.random(count) < Character.RANDOM_WALK_CHANCE)
+        walk_time = self.rng.integers(Character.MIN_WALKING_TIME, Character.MAX_WALKING_TIME + 1, count)
+        walking = np.where(starts, walk_time, walking)
+        return movement_x, flip, walking
+
+    def move_axis(self, axis: int, pos, size, frame_movement, tile_size: int) -> tuple:
+        ''' Batched Entity.update_position_and_collisions for one axis, moving pos in place. Like pygame.Rect,
+        the collision box truncates the position. Returns the (rear, front) collision flags. '''
+        pos[:, axis] += frame_movement
+        box = np.trunc(pos).astype(np.int64)
+        first_col = box[:, 0] // tile_size
+        last_col = (box[:, 0] + size[:, 0] - 1) // tile_size
+        first_row = box[:, 1] // tile_size
+        last_row = (box[:, 1] + size[:, 1] - 1) // tile_size
+
+        if axis == 0:
+            near = self.solid_at(first_col, first_row) | self.solid_at(first_col, last_row)
+            far = self.solid_at(last_col, first_row) | self.solid_at(last_col, last_row)
+            first, last = first_col, last_col
+        else:
+            near = self.solid_at(first_col, first_row) | self.solid_at(last_col, first_row)
+            far = self.solid_at(first_col, last_row) | self.solid_at(last_col, last_row)
+            first, last = first_row, last_row
+        hit = near | far
+
+        forward = frame_movement > 0
+        backward = frame_movement < 0
+        snapped = box[:, axis]
+        snapped = np.where(forward & hit, np.where(near, first, last) * tile_size - size[:, axis], snapped)
+        snapped = np.where(backward & hit, (np.where(far, last, first) + 1) * tile_size, snapped)
+        pos[:, axis] = np.where(hit, snapped, pos[:, axis])
+        return backward & hit, forward & hit
+
+    def load_solid_grid(self, tilemap, active) -> None:
+        ''' Rebuilds the dense solid grid from the tilemap whenever its solid tiles change. On binary maps the
+        chunks the active characters stand on are materialized first. '''
+        if tilemap.level:
+            chunks = np.unique(np.floor(self.pos[active] / (tilemap.tile_size * CHUNK_SIZE)).astype(np.int64), axis=0)
+            for chunk_x, chunk_y in chunks.tolist():
+                # one tile of margin around the chunk, two below for the ground probe
+                tilemap.ensure_area(chunk_x * CHUNK_SIZE - 1, chunk_y * CHUNK_SIZE - 1, (chunk_x + 1) * CHUNK_SIZE, (chunk_y + 1) * CHUNK_SIZE + 1)
+        if tilemap.solid_version == self.solid_version:
+            return
+        self.solid_version = tilemap.solid_version
+        if not tilemap.solid_tiles:
+            self.solid = np.zeros((0, 0), dtype=bool)
+            return
+        locs = np.array(list(tilemap.solid_tiles), dtype=np.int64)
+        origin = locs.min(axis=0)
+        shape = locs.max(axis=0) - origin + 1
+        self.solid = np.zeros((shape[0], shape[1]), dtype=bool)
+        self.solid[locs[:, 0] - origin[0], locs[:, 1] - origin[1]] = True
+        self.solid_origin = (int(origin[0]), int(origin[1]))
+
+    def solid_at(self, tile_x, tile_y):
+        ''' Vectorized Tilemap.solid_check on tile coordinates, anything outside the grid is empty '''
+        x = tile_x - self.solid_origin[0]
+        y = tile_y - self.solid_origin[1]
+        inside = (x >= 0) & (x < self.solid.shape[0]) & (y >= 0) & (y < self.solid.shape[1])
+        return inside & self.solid[np.where(inside, x, 0), np.where(inside, y, 0)] if self.solid.size else inside
+
+    def write_back(self, indices) -> list:
+        ''' Copies positions and flips back to the Character objects at indices and ticks their own animations '''
+        updated = []
+        for i, pos, flip in zip(indices.tolist(), self.pos[indices].tolist(), self.flip[indices].tolist()):
+            character = self.characters[i]
+            character.prev_pos[0], character.prev_pos[1] = character.pos[0], character.pos[1]
+            character.pos[0] = pos[0]
+            character.pos[1] = pos[1]
+            character.flip = flip
+            if self.animations[i]:
+                self.animations[i].update()
+            updated.append(character)
+        return updated
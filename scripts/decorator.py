@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 
 class IDecorable(ABC):
     ''' Abstract base class representing an object that can be decorated with additional behavior, specifically focused on a jump behavior.'''
+    __slots__ = ()
+
     @abstractmethod
     def jump(self) -> None:
         pass
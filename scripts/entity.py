@@ -8,49 +8,69 @@ from trapezes import Trapeze
 from tilemap import Tilemap
 from utils import play_sound
 from enum import Enum
-import random
 
 
 class IRenderable(ABC):
     ''' Abstract base class representing an object that can be rendered in the game.'''
+    __slots__ = ()
+
     def update(self, tilemap: Tilemap, movement: tuple = (0,0)) -> None:
         pass
 
 class Entity(IRenderable):
 
     GRAVITY = 0.1
+    COLLISION_SIDES = {'top': 1, 'bottom': 2, 'left': 4, 'right': 8}
     
-    ''' Class Entity that implements the interface renderable used for players and characters'''
-    def __init__(self, game, pos: tuple, size: int, e_type: str) -> None:
+    ''' Class Entity that implements the interface renderable used for players and characters.
+    Collisions are bit flags (see COLLISION_SIDES) and rect() updates one persistent Rect in place'''
+    __slots__ = ('game', 'size', 'e_type', 'pos', 'prev_pos', 'velocity', 'collisions', 'action', 'animation', 
+                 'anim_offset', 'flip', 'anim_phase', 'box')
+
+    def __init__(self, game, pos: tuple, size: int, e_type: str, anim_phase: int =0) -> None:
+        ''' anim_phase starts the entity´s animations that many ticks in, so a crowd does not animate in lockstep'''
         self.game = game
         self.size: int = size
         self.e_type: str = e_type
         self.pos: list = list(pos)        
+        self.prev_pos: list = list(pos)
         self.velocity: list = [0, 0]
-        self.collisions: dict = {'top': False, 'bottom': False, 'left': False, 'right': False}
+        self.collisions: int = 0
+        self.box: pygame.Rect = pygame.Rect(self.pos[0], self.pos[1], self.size[0], self.size[1])
         self.action: str = ''
         self.animation: str = ''        
         self.anim_offset: tuple = (-1, -1)
         self.flip: bool = False
+        self.anim_phase: int = anim_phase
         self.set_action('idle')   
       
         
     def rect(self) -> pygame.Rect:
-        ''' Returns a pygame Rect representing the entity´s current position and size'''
-        return pygame.Rect(self.pos[0] , self.pos[1] , self.size[0], self.size[1])
+        ''' Returns a pygame Rect representing the entity´s current position and size. 
+        The same Rect is reused on every call, so it is only valid until the entity moves'''
+        self.box.update(self.pos[0], self.pos[1], self.size[0], self.size[1])
+        return self.box
+
+    def collided(self, side: str) -> bool:
+        ''' Checks whether the entity collided on the given side ('top', 'bottom', 'left' or 'right') this frame'''
+        return bool(self.collisions & self.COLLISION_SIDES[side])
     
     def set_action(self, action: str) -> None:
         ''' Select the action for different animations '''
         if action != self.action:
             self.action = action
-            self.animation = self.game.assets[self.e_type + '/' + self.action].copy()
+            self.animation = self.game.assets[self.e_type + '/' + self.action].copy(self.anim_phase)
             
-    def render(self, surf: pygame.display, offset=(0,0)) -> None:
-        ''' Render the element on screen with certain animation and position '''        
-        surf.blit(pygame.transform.flip(self.animation.img(), self.flip, False), (self.pos[0] - offset[0], self.pos[1] - 8 - offset[1]))
+    def render(self, surf: pygame.display, offset=(0,0), alpha: float =1.0) -> None:
+        ''' Render the element on screen with certain animation and position. 
+        alpha interpolates between the position before and after the last update '''        
+        pos_x = self.pos[0] - (self.pos[0] - self.prev_pos[0]) * (1 - alpha)
+        pos_y = self.pos[1] - (self.pos[1] - self.prev_pos[1]) * (1 - alpha)
+        surf.blit(self.animation.img(self.flip), (pos_x - offset[0], pos_y - 8 - offset[1]))
             
     def update(self, tilemap: Tilemap, movement:tuple = (0,0)) -> None:
         ''' Update element´s position and identify interaction with the floor'''
+        self.prev_pos[0], self.prev_pos[1] = self.pos[0], self.pos[1]
         frame_movement = self.calculate_frame_movement(movement)
         self.reset_collisions()     
         self.handle_movements(tilemap, frame_movement)
@@ -64,7 +84,7 @@ class Entity(IRenderable):
 
     def reset_collisions(self):
         ''' Reset collision states for the new frame. '''
-        self.collisions = {'top': False, 'bottom': False, 'left': False, 'right': False}
+        self.collisions = 0
     
     def handle_movements(self, tilemap: Tilemap, frame_movement: tuple):
         ''' Handle horizontal and vertical movements. '''
@@ -74,7 +94,7 @@ class Entity(IRenderable):
     def apply_gravity_and_collision_effects(self):
         ''' Apply gravity and adjust velocity based on collision states. '''
         self.velocity[1] += self.GRAVITY
-        if self.collisions['bottom'] or self.collisions['top']:
+        if self.collisions & (self.COLLISION_SIDES['bottom'] | self.COLLISION_SIDES['top']):
             self.velocity[1] = 0
 
     def handle_movement(self, direction: str, tilemap: Tilemap, frame_movement: tuple) -> None:
@@ -99,7 +119,7 @@ class Entity(IRenderable):
         '''Update the position and detect collisions.'''
         self.pos[axis] += frame_movement[axis]
         entity_rect = self.rect()
-        for rect in tilemap.physics_recs_around(self.pos):
+        for rect in tilemap.physics_recs_around(self.pos, entity_rect):
             if entity_rect.colliderect(rect):
                 self.handle_collision(entity_rect, rect, frame_movement, axis, 
                                        collision_front, collision_rear, axis_letter)
@@ -109,10 +129,10 @@ class Entity(IRenderable):
         '''Handle collision with another object.'''
         if frame_movement[axis] > 0:
             setattr(entity_rect, collision_front, getattr(rect, collision_rear))
-            self.collisions[collision_front] = True
+            self.collisions |= self.COLLISION_SIDES[collision_front]
         if frame_movement[axis] < 0:
             setattr(entity_rect, collision_rear, getattr(rect, collision_front))
-            self.collisions[collision_rear] = True
+            self.collisions |= self.COLLISION_SIDES[collision_rear]
         self.pos[axis] = getattr(entity_rect, axis_letter)
                 
     def handle_flips(self, movement: tuple) -> None:
@@ -133,8 +153,10 @@ class Player(Entity, IDecorable):
     COLLISION_VELOCITY_Y = -2
 
     ''' Class player that inherits from Entity. Adds jump hability and manages player actions'''
-    def __init__(self, game, pos: tuple, size: int, e_type: str) -> None:
-        super().__init__(game, pos, size, e_type)
+    __slots__ = ('trapeze', 'jumps', 'air_time')
+
+    def __init__(self, game, pos: tuple, size: int, e_type: str, anim_phase: int =0) -> None:
+        super().__init__(game, pos, size, e_type, anim_phase)
         self.trapeze: Trapeze = None
         self.jumps = self.MAX_JUMPS
         self.air_time = 0
@@ -151,15 +173,16 @@ class Player(Entity, IDecorable):
     
     def check_collision_with_collectables(self) -> None:
         '''Check for collision with characters and react accordingly'''
-        for collectable in self.game.collectables:  
+        for collectable in self.game.collectable_grid.query(self.rect()):  
             if self.rect().colliderect(collectable.rect()):
                 play_sound(self.game, 'collect')
                 self.game.decorate()
                 self.game.collectables.remove(collectable)
+                self.game.collectable_grid.remove(collectable)
 
     def check_collision_with_characters(self) -> None:
         '''Check for collision with collectable and react accordingly'''
-        for character in self.game.characters:  
+        for character in self.game.character_grid.query(self.rect()):  
             if self.rect().colliderect(character.rect()):
                 self.jumps = self.MAX_JUMPS
                 self.react_to_collision()
@@ -193,7 +216,7 @@ class Player(Entity, IDecorable):
                 
     def reset_jumps(self) -> None:
         ''' Reset jumps when touching the ground'''
-        if self.collisions['bottom']:
+        if self.collided('bottom'):
             self.air_time = 0
             self.jumps = self.MAX_JUMPS
     
@@ -215,8 +238,10 @@ class Character(Entity):
     MAX_WALKING_TIME = 120
 
     ''' Class Character that inherits from Entity'''
-    def __init__(self, game, pos: tuple, size: int, e_type: str) -> None:
-        super().__init__(game, pos, size, e_type)    
+    __slots__ = ('walking',)
+
+    def __init__(self, game, pos: tuple, size: int, e_type: str, anim_phase: int =0) -> None:
+        super().__init__(game, pos, size, e_type, anim_phase)    
         self.walking: int = 0
     
     def update(self, tilemap, movement=(0, 0)) -> None:
@@ -228,8 +253,8 @@ class Character(Entity):
         '''Determine character movement based on walking status and tilemap interaction.'''
         if self.walking:
             movement = self.handle_walking_logic(tilemap, movement)
-        elif random.random() < self.RANDOM_WALK_CHANCE:
-            self.walking = random.randint(self.MIN_WALKING_TIME, self.MAX_WALKING_TIME)
+        elif self.game.rng.random() < self.RANDOM_WALK_CHANCE:
+            self.walking = self.game.rng.randint(self.MIN_WALKING_TIME, self.MAX_WALKING_TIME)
         return movement
     
     def handle_walking_logic(self, tilemap, movement):
@@ -264,7 +289,7 @@ class Character(Entity):
 
     def is_colliding_horizontally(self) -> bool:
         '''Check if the character is colliding horizontally.'''
-        return self.collisions['right'] or self.collisions['left']
+        return bool(self.collisions & (self.COLLISION_SIDES['right'] | self.COLLISION_SIDES['left']))
 
     def get_adjusted_movement(self, movement: tuple) -> bool:
         '''Calculate adjusted movement based on walking speed.'''
@@ -281,8 +306,10 @@ class Character(Entity):
     
 class Collectable(Entity):
     ''' Class Collectable that inherits from Entity'''
-    def __init__(self, game, pos: tuple, size: int, e_type: str) -> None:
-        super().__init__(game, pos, size, e_type)    
+    __slots__ = ()
+
+    def __init__(self, game, pos: tuple, size: int, e_type: str, anim_phase: int =0) -> None:
+        super().__init__(game, pos, size, e_type, anim_phase)    
 
     def update(self, tilemap: Tilemap, movement: tuple=(0, 0)) -> None:
         '''Update collectable animation'''
@@ -0,0 +1,16 @@
+from enum import Enum
+
+
+class GameEvent(Enum):
+    ''' Events the simulation queues on Trapezirque.events for the game to consume once per step '''
+
+    BALLOON_COLLECTED = 'balloon_collected'
+
+
+class Action(Enum):
+    ''' Player inputs. They are pressed and released from the keyboard or, in headless mode, by the caller '''
+
+    LEFT = 'left'
+    RIGHT = 'right'
+    JUMP = 'jump'
+    SWING = 'swing'
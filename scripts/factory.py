@@ -14,7 +14,7 @@ class Creator:
         self._size: int = None
     
     @abstractmethod
-    def create_entity(self, game, type: str, pos: tuple, size: int, e_type: str) -> Entity:
+    def create_entity(self, game, type: str, pos: tuple, size: int, e_type: str, anim_phase: int = 0) -> Entity:
         ''' Generate the entity to be displayed on screen'''
         pass  
 
@@ -26,6 +26,6 @@ class EntityCreator(Creator):
         CHARACTER        = Character
         COLLECTABLE      = Collectable
         
-    def create_entity(self, game, type: str, pos: tuple, size: int, e_type: str) -> Entity:
-        ''' Generate the entity to be displayed on screen'''        
-        return type.value(game, pos, size, e_type)
\ No newline at end of file
+    def create_entity(self, game, type: str, pos: tuple, size: int, e_type: str, anim_phase: int = 0) -> Entity:
+        ''' Generate the entity to be displayed on screen, its animations starting anim_phase ticks in'''        
+        return type.value(game, pos, size, e_type, anim_phase)
\ No newline at end of file
@@ -1,15 +1,25 @@
+import os
 import pygame
+import random
 import sys
+import time
 from factory import EntityCreator, Player
 from decorator import DoubleJumpDecorator
 from tilemap import Tilemap
-from utils import get_assets, play_music,  Animation
-from balloons import Balloons
-from trapezes import Trapeze
+from utils import get_assets, play_music, play_sound, update_shared_animations, Animation
+from balloons import Balloons, BalloonField
+from characters import Characters
+from trapezes import Trapeze, update_trapezes
+from spatialhash import SpatialHash
+from textcache import TextCache
+from presenter import Presenter
 from pygame.locals import *
 from pygame import mixer
 from enum import Enum
 from memento import GameMemento, GameCaretaker
+from events import Action, GameEvent
+from recording import Recording
+from collections import deque
 
 class Spawner(Enum):
     ''' Enum class used for entities values '''
@@ -26,8 +36,38 @@ class Trapezirque:
     
     WIDTH = 640
     HEIGHT = 480        
-
-    def __init__(self) -> None:
+    MAP_PATH = 'map.json'
+    STREAM_MAP = False
+    BATCH_CHARACTERS = True
+    BATCH_BALLOONS = True
+    BALLOON_COUNT = 10
+    BALLOON_STORM = False
+    BALLOON_STORM_COUNT = 2000
+    ACTIVE_MARGIN = 160
+    RENDER_MARGIN = 16
+    FPS = 60
+    STEP_TIME = 1 / 60
+    MAX_STEPS_PER_FRAME = 5
+    SIMULATION_SPEED = 1.0
+    UNCAPPED_RENDER = False
+    SEED = None
+    RECORD_INPUT = False
+    RECORDING_PATH = 'recording.json'
+    KEY_ACTIONS = {pygame.K_LEFT: Action.LEFT, pygame.K_RIGHT: Action.RIGHT, pygame.K_UP: Action.JUMP, pygame.K_SPACE: Action.SWING}
+
+    def __init__(self, headless: bool =False, seed: int =None, replaying: bool =False) -> None:
+        ''' Builds the game. A headless game has no window, audio or frame cap and is driven through press, 
+        release, step and state. Every random decision of the simulation comes from self.rng, seeded with seed, 
+        SEED or a random seed, in that order. Games that record their input or are built to replay a recording
+        never stream the map, since streamed chunks spawn their entities whenever the background thread is done '''
+        self.started: float = time.perf_counter()
+        self.headless: bool = headless
+        if seed is None:
+            seed = self.SEED if self.SEED is not None else random.getrandbits(32)
+        self.seed: int = seed
+        self.rng: random.Random = random.Random(seed)
+        self.step_count: int = 0
+        self.recording: Recording = Recording(seed) if self.RECORD_INPUT else None
         self.initialize_libs()
 
         self.W: int = self.WIDTH
@@ -37,33 +77,78 @@ class Trapezirque:
         self.screen: pygame.display = pygame.display.set_mode((self.W,self.H))
         self.display: pygame.surface = pygame.Surface((self.W/2, self.H/2))
         self.clock = pygame.time.Clock()
+        self.presenter: Presenter = Presenter(self.display, self.screen)
         self.movement: list = [False, False]
         self.score: int = 0
         self.game_over: bool = False
         self.decorator: DoubleJumpDecorator = None
-        mixer.init()
+        self.events: deque = deque()
+
+        self.first_frame_time: float = None
+        self.text: TextCache = TextCache()
+        self.score_text: tuple = None
 
-        self.assets: dict = get_assets()
+        # sprites and sounds decode in the background while the map is parsed and the intro runs
+        self.assets: dict = get_assets(lazy=True)
+        stream = self.STREAM_MAP and not (self.recording or replaying)
+        self.tilemap = Tilemap(self, tile_size=16, bake=True, stream=stream)
+        self.tilemap.load(self.MAP_PATH)
         self.creator: EntityCreator = EntityCreator()
         
-        self.acrobat : Player = self.creator.create_entity(self, self.creator.EntityType.PLAYER, (50, 208), (16,16), 'acrobat')
-        self.balloons: Balloons = Balloons(self,self.assets['balloons'], 16, count=10)
-        self.tilemap = Tilemap(self, tile_size=16)
-        self.tilemap.load('map.json')
+        self.acrobat : Player = None
+        self.balloons: Balloons = None
+        self.batch: Characters = Characters(self) if self.BATCH_CHARACTERS and Characters.available() else None
+        self.character_grid: SpatialHash = SpatialHash()
+        self.collectable_grid: SpatialHash = SpatialHash()
+        self.trapeze_grid: SpatialHash = SpatialHash()
         self.characters: list = []
         self.trapezes: list[Trapeze] = []
         self.collectables: list[EntityCreator.EntityType.COLLECTABLE] = []
-        
-        for spawner in self.tilemap.extract([('spawners', Spawner.ACROBAT.value),('spawners', Spawner.CLOWN.value),('spawners',Spawner.MONKEY.value),('spawners',Spawner.COIN.value),('spawners',Spawner.TRAPEZE.value)]):
-            self.handle_spawner(spawner)       
-        
         self.scroll = [0,0]
+        self.prev_scroll = [0,0]
+        if self.headless:
+            self.prepare_play()
+
+    def prepare_play(self) -> None:
+        ''' Builds what only the game itself needs: the acrobat, the balloons, the spawned entities and the baked
+        tilemap chunks. It waits for the gameplay sprites, so it is kept off the intro. Does nothing once done '''
+        if self.acrobat is not None:
+            return
+        self.acrobat = self.creator.create_entity(self, self.creator.EntityType.PLAYER, (50, 208), (16,16), 'acrobat')
+        balloon_count = self.BALLOON_STORM_COUNT if self.BALLOON_STORM else self.BALLOON_COUNT
+        if self.BATCH_BALLOONS and BalloonField.available():
+            self.balloons = BalloonField(self, self.assets['balloons'], 16, count=balloon_count)
+        else:
+            self.balloons = Balloons(self,self.assets['balloons'], 16, count=balloon_count)
+        
+        spawners = [('spawners', Spawner.ACROBAT.value),('spawners', Spawner.CLOWN.value),('spawners',Spawner.MONKEY.value),('spawners',Spawner.COIN.value),('spawners',Spawner.TRAPEZE.value)]
+        if self.tilemap.stream and self.tilemap.level:
+            # offgrid tiles are loaded eagerly and so are their spawners, ongrid spawners are handled as their 
+            # chunks stream in and only the acrobat´s chunk is needed right away
+            for spawner in self.tilemap.extract_offgrid(spawners):
+                self.handle_spawner(spawner)
+            self.tilemap.stream_spawners(spawners, self.handle_spawner)
+            self.tilemap.ensure_tiles([('spawners', Spawner.ACROBAT.value)])
+        else:
+            for spawner in self.tilemap.extract(spawners):
+                self.handle_spawner(spawner)       
+        if self.tilemap.bake and not self.tilemap.level:
+            self.tilemap.bake_chunks()
+        if self.recording:
+            self.recording.begin(self.acrobat.pos, self.score)
 
     def initialize_libs(self) -> None:
         ''' Several resources initializer '''
+        if self.headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+            os.environ['SDL_AUDIODRIVER'] = 'dummy'
         pygame.init()
         pygame.font.init()
-        mixer.init()
+        if self.headless:
+            # without a mixer the sound bank stays empty and nothing is played
+            mixer.quit()
+        else:
+            mixer.init()
         pygame.display.set_caption("trapezirque")
 
     def handle_spawner(self, spawner) -> None:
@@ -74,7 +159,7 @@ class Trapezirque:
             Spawner.CLOWN.value: lambda: self.spawn_entity('clown', self.creator.EntityType.CHARACTER, self.characters, spawner),
             Spawner.MONKEY.value: lambda: self.spawn_entity('monkey', self.creator.EntityType.CHARACTER, self.characters, spawner),
             Spawner.COIN.value: lambda: self.spawn_entity('coin', self.creator.EntityType.COLLECTABLE, self.collectables, spawner),
-            Spawner.TRAPEZE.value: lambda: self.trapezes.append(Trapeze(self, spawner['pos'], 62, 5))
+            Spawner.TRAPEZE.value: lambda: self.spawn_trapeze(spawner)
         }
 
         if variant in spawner_actions:
@@ -82,8 +167,22 @@ class Trapezirque:
 
     def spawn_entity(self, entity_type: str, entity_enum: EntityCreator.EntityType , entity_list: list, spawner) -> None:
         ''' Encharge of spawning the differnt kind of elements present in the game '''
-        entity = self.creator.create_entity(self, entity_enum, spawner['pos'], (16, 16), entity_type)
+        # the phase comes from the spawn position, so neighbours animate out of step without using the rng
+        anim_phase = int(spawner['pos'][0] + spawner['pos'][1])
+        entity = self.creator.create_entity(self, entity_enum, spawner['pos'], (16, 16), entity_type, anim_phase)
         entity_list.append(entity)
+        if entity_enum == self.creator.EntityType.CHARACTER:
+            self.character_grid.insert(entity, entity.rect())
+            if self.batch is not None:
+                self.batch.add(entity)
+        else:
+            self.collectable_grid.insert(entity, entity.rect())
+
+    def spawn_trapeze(self, spawner) -> None:
+        ''' Spawns a trapeze, registered in the broadphase with the whole area it can swing through '''
+        trapeze = Trapeze(self, spawner['pos'], 62, 5)
+        self.trapezes.append(trapeze)
+        self.trapeze_grid.insert(trapeze, trapeze.swing_rect())
 
 
     #run game
@@ -108,18 +207,24 @@ class Trapezirque:
         self.intro_running: bool = True
         self.intro_animation_index: int = 0
         self.last_switch_time: int = pygame.time.get_ticks()
+        # only the "Press Start" ad changes between the two welcome frames
+        switch_area = Presenter.changed_area(self.assets['welcome'][0], self.assets['welcome'][1])
+        self.display_intro(self.intro_animation_index)
+        self.update_display()
 
         while self.intro_running:
-            self.update_intro_animation()
+            switched = self.update_intro_animation()
 
             for event in pygame.event.get():
               self.handle_intro_events(event)
 
-            self.display_intro(self.intro_animation_index)
-            self.update_display()
+            if switched:
+                self.display_intro(self.intro_animation_index)
+            self.update_display(dirty=[switch_area] if switched else [])
 
     def handle_intro_events(self, event) -> None:
         ''' Handles de events when the game is closed or any key is pressed on the intro screen'''
+        self.presenter.handle_event(event)
         if event.type == pygame.QUIT:
             self.quit_game()
         elif event.type == pygame.KEYDOWN:
@@ -133,13 +238,15 @@ class Trapezirque:
         if event.key == pygame.K_RETURN:
             self.intro_running = False
 
-    def update_intro_animation(self) -> None:
-        ''' Makes the "Press Start" ad to tick '''
+    def update_intro_animation(self) -> bool:
+        ''' Makes the "Press Start" ad to tick. Returns whether it switched '''
         SWITCH_INTERVAL = 500  
         current_time = pygame.time.get_ticks()
         if current_time - self.last_switch_time > SWITCH_INTERVAL:
             self.intro_animation_index = 1 - self.intro_animation_index
             self.last_switch_time = current_time
+            return True
+        return False
 
     def display_intro(self, index: int) -> None:
         ''' Renders the Intro screen with the Welcome and several extra text announcements'''
@@ -148,37 +255,144 @@ class Trapezirque:
 
     def render_intro_text(self) -> None:
         ''' Render on the intro screen the Record and instructions for loading game'''
-        font = pygame.font.Font(None, 20)
-        record_text = font.render(f'Record: {self.record}', True, (0,0,0))
+        record_text = self.text.render(f'Record: {self.record}', 20, (0,0,0))
         self.display.blit(record_text, (10, 10))
-        font = pygame.font.Font(None, 15)
-        load_game_text = font.render(f'Press "r" to load game', True, (0,0,0))
+        load_game_text = self.text.render(f'Press "r" to load game', 15, (0,0,0))
         self.display.blit(load_game_text, (200, 3))
 
 
     #start game
-    def start_game(self) -> None:
-        ''' Handles all the main Game initializers, rendering and events'''
+    def start_game(self, replay: Recording =None) -> None:
+        ''' Handles all the main Game initializers, rendering and events. 
+        The simulation advances in fixed STEP_TIME steps, as many per rendered frame as the elapsed time 
+        (scaled by SIMULATION_SPEED) asks for, and rendering interpolates between the last two steps.
+        With a replay the player´s actions come from the recording instead of the keyboard'''
+        self.prepare_play()
         play_music(self, 'main')
+        accumulator: float = self.STEP_TIME
+        last_time: float = time.perf_counter()
+        replay_inputs: dict = replay.inputs_by_step() if replay else None
+        if self.recording:
+            self.recording.begin(self.acrobat.pos, self.score)
         
         while True:
-            self.display.blit(self.assets['background'], (0,0))
-            self.handle_camera_scroll()
-            render_scroll: tuple = (int(self.scroll[0]), int(self.scroll[1]))
+            now = time.perf_counter()
+            accumulator += (now - last_time) * self.SIMULATION_SPEED
+            last_time = now
 
-            self.tilemap.render(self.display, offset=render_scroll)
-            self.update_and_render_elements(render_scroll)
-            self.render_game_text()
-
-        
             for event in pygame.event.get(): 
-                self.handle_game_events(event)
-
+                if replay is None or event.type == pygame.QUIT:
+                    self.handle_game_events(event)
+
+            steps = 0
+            while accumulator >= self.STEP_TIME and steps < self.MAX_STEPS_PER_FRAME and not self.game_over:
+                if replay:
+                    if self.step_count >= replay.steps:
+                        break
+                    self.apply_inputs(replay_inputs)
+                self.simulate_step()
+                accumulator -= self.STEP_TIME
+                steps += 1
+            if steps == self.MAX_STEPS_PER_FRAME:
+                # too far behind, drop the backlog instead of trying to catch up forever
+                accumulator = min(accumulator, self.STEP_TIME)
+
+            if replay and (self.game_over or self.step_count >= replay.steps):
+                break
             if self.game_over:
                 self.handle_gameover()
                 break
-            
-            self.update_display()
+
+            self.render_frame(accumulator / self.STEP_TIME)
+            self.update_display(0 if self.UNCAPPED_RENDER else self.FPS)
+
+    def step(self, steps: int =1) -> int:
+        ''' Advances the simulation by up to steps fixed steps, stopping once the game is over. 
+        Returns how many steps were run '''
+        self.prepare_play()
+        for done in range(steps):
+            if self.game_over:
+                return done
+            self.simulate_step()
+        return steps
+
+    def state(self) -> dict:
+        ''' Returns a snapshot of the game state '''
+        return {
+            'pos': tuple(self.acrobat.pos),
+            'velocity': tuple(self.acrobat.velocity),
+            'swinging': self.acrobat.trapeze is not None,
+            'score': self.score,
+            'scroll': tuple(self.scroll),
+            'game_over': self.game_over,
+        }
+
+    def simulate_step(self) -> None:
+        ''' Advances the simulation by one fixed step '''
+        self.prev_scroll[0], self.prev_scroll[1] = self.scroll[0], self.scroll[1]
+        self.handle_camera_scroll()
+        self.tilemap.update_stream(self.display, (int(self.scroll[0]), int(self.scroll[1])))
+        self.update_elements()
+        self.process_events()
+        self.step_count += 1
+
+    def replay(self, recording: Recording, realtime: bool =False) -> None:
+        ''' Re-runs a recorded session on a game built with the recording´s seed and replaying=True. In real time
+        it is rendered like a normal game, otherwise the steps run back to back as fast as possible '''
+        if self.tilemap.stream:
+            raise ValueError('a streamed map can not be replayed, build the game with replaying=True')
+        self.prepare_play()
+        self.recording = None
+        if recording.start:
+            self.acrobat.pos[0], self.acrobat.pos[1] = recording.start['pos']
+            self.score = recording.start['score']
+        if realtime:
+            self.start_game(replay=recording)
+            return
+        inputs = recording.inputs_by_step()
+        while self.step_count < recording.steps and not self.game_over:
+            self.apply_inputs(inputs)
+            self.simulate_step()
+
+    def apply_inputs(self, inputs: dict) -> None:
+        ''' Presses and releases the actions recorded before the current step '''
+        for action, pressed in inputs.get(self.step_count, ()):
+            if pressed:
+                self.press(action)
+            else:
+                self.release(action)
+
+    def save_recording(self, path: str =None) -> None:
+        ''' Writes the actions recorded so far, if recording is enabled '''
+        if self.recording:
+            self.recording.steps = self.step_count
+            self.recording.save(path or self.RECORDING_PATH)
+
+    def process_events(self) -> None:
+        ''' Consumes the events queued by the simulation during the last step '''
+        collected = 0
+        while self.events:
+            event = self.events.popleft()
+            if event == GameEvent.BALLOON_COLLECTED:
+                collected += 1
+        if collected:
+            self.collect_balloons(collected)
+
+    def collect_balloons(self, count: int) -> None:
+        ''' Increases the score for the collected ballons, playing the sound once per step '''
+        play_sound(self, 'balloon')
+        self.score += count
+
+    def render_frame(self, alpha: float =1.0) -> None:
+        ''' Renders the game with positions interpolated alpha of the way from the previous step to the last one '''
+        self.display.blit(self.assets['background'], (0,0))
+        scroll_x = self.scroll[0] - (self.scroll[0] - self.prev_scroll[0]) * (1 - alpha)
+        scroll_y = self.scroll[1] - (self.scroll[1] - self.prev_scroll[1]) * (1 - alpha)
+        render_scroll: tuple = (int(scroll_x), int(scroll_y))
+
+        self.tilemap.render(self.display, offset=render_scroll)
+        self.render_elements(render_scroll, alpha)
+        self.render_game_text()
 
     def handle_camera_scroll(self) -> None:
         ''' Handles every camera scroll for when the player moves through the game '''
@@ -212,34 +426,59 @@ class Trapezirque:
         if self.acrobat.rect().centery > bottom_edge_y + self.scroll[1]:
             self.scroll[1] += (self.acrobat.rect().centery - bottom_edge_y - self.scroll[1])
 
-    def update_and_render_elements(self, render_scroll) -> None:
-        ''' Encharge of rendering and updating the different elements present in the game '''
-        for character in self.characters.copy():
-            character.update(self.tilemap, (0,0))
-            character.render(self.display, offset = render_scroll)
+    def update_elements(self) -> None:
+        ''' Encharge of updating the different elements present in the game for one simulation step '''
+        update_shared_animations(self.assets)
+        camera = pygame.Rect((int(self.scroll[0]), int(self.scroll[1])), self.display.get_size())
+        active_area = camera.inflate(self.ACTIVE_MARGIN * 2, self.ACTIVE_MARGIN * 2)
+
+        for character in self.update_active_characters(active_area):
+            self.character_grid.move(character, character.rect())
         
-        for collectable in self.collectables.copy():
+        for collectable in self.collectable_grid.query(active_area):
             collectable.update(self.tilemap, (0,0))
-            collectable.render(self.display, offset = render_scroll)
         
-        for trapeze in self.trapezes.copy():
-            trapeze.update()
-            trapeze.draw(self.display, offset = render_scroll)
+        update_trapezes(self.trapeze_grid.query(active_area))
         
         self.balloons.update()
-        self.balloons.render(self.display, offset=render_scroll)
 
         self.acrobat.update(self.tilemap, (self.movement[1] - self.movement[0], 0))
-        self.acrobat.render(self.display, offset=render_scroll)
 
+    def render_elements(self, render_scroll, alpha: float =1.0) -> None:
+        ''' Encharge of rendering the different elements present in the game that are on screen '''
+        camera = pygame.Rect(render_scroll, self.display.get_size())
+        visible_area = camera.inflate(self.RENDER_MARGIN * 2, self.RENDER_MARGIN * 2)
+
+        for character in self.character_grid.query(visible_area):
+            character.render(self.display, offset = render_scroll, alpha = alpha)
+        
+        for collectable in self.collectable_grid.query(visible_area):
+            collectable.render(self.display, offset = render_scroll, alpha = alpha)
+        
+        for trapeze in self.trapeze_grid.query(visible_area):
+            trapeze.draw(self.display, offset = render_scroll, alpha = alpha)
+        
+        self.balloons.render(self.display, offset=render_scroll, alpha=alpha)
+
+        self.acrobat.render(self.display, offset=render_scroll, alpha=alpha)
+
+
+    def update_active_characters(self, active_area: pygame.Rect) -> list:
+        ''' Updates the characters inside active_area, the rest stay dormant until the camera gets close again.
+        Returns the characters that were updated '''
+        if self.batch is not None:
+            return self.batch.update(self.tilemap, active_area)
+        active = [character for character in self.character_grid.query(active_area) if character.rect().colliderect(active_area)]
+        for character in active:
+            character.update(self.tilemap, (0,0))
+        return active
 
     def render_game_text(self) -> None:
         ''' On Game screen, renders de Score and instructions for saving current game'''
-        font = pygame.font.Font(None, 20)
-        score_text = font.render(f'Score: {self.score}', True, (0,0,0))
-        self.display.blit(score_text, (10, 10))
-        font = pygame.font.Font(None, 15)
-        save_game_text = font.render(f'"q" to save and exit', True, (0,0,0))
+        if self.score_text is None or self.score_text[0] != self.score:
+            self.score_text = (self.score, self.text.render(f'Score: {self.score}', 20, (0,0,0)))
+        self.display.blit(self.score_text[1], (10, 10))
+        save_game_text = self.text.render(f'"q" to save and exit', 15, (0,0,0))
         self.display.blit(save_game_text, (110, 3))
 
     def handle_game_events(self, event) -> None:
@@ -264,38 +503,54 @@ class Trapezirque:
     
     def handle_swing(self) -> None:
         ''' Encharge of managing the interaction of the player with the trapezes when swinging '''
-        for trapeze in self.trapezes:
+        for trapeze in self.trapeze_grid.query(self.acrobat.rect()):
             if trapeze.rect().colliderect(self.acrobat.rect()):
                 trapeze.attach_entity(self.acrobat)
                 self.acrobat.trapeze = trapeze
     
     def handle_keydown(self, event) -> None:
         ''' Handles the key down events on the main game, for player movement, jumping, swinging and saving game'''
-        if event.key == pygame.K_LEFT:
-            self.movement[0] = True
-        if event.key == pygame.K_RIGHT:
-            self.movement[1] = True
-        if event.key == pygame.K_UP:
-            self.handle_jump()
+        if event.key in self.KEY_ACTIONS:
+            self.press(self.KEY_ACTIONS[event.key])
         if event.key == pygame.K_q:
             caretaker.save_game(self.acrobat.pos[0], self.acrobat.pos[1], self.score, self.record, False)
             self.quit_game()
-        if event.key == pygame.K_SPACE:
-            self.handle_swing()
 
     def handle_keyup(self, event) -> None:
         ''' Handles all key up events to stop moving or detach from trapezes'''
-        if event.key == pygame.K_LEFT:
+        if event.key in self.KEY_ACTIONS:
+            self.release(self.KEY_ACTIONS[event.key])
+
+    def press(self, action: Action) -> None:
+        ''' Starts a player action: walking, jumping or grabbing a trapeze '''
+        if self.recording:
+            self.recording.record(self.step_count, action, True)
+        if action == Action.LEFT:
+            self.movement[0] = True
+        if action == Action.RIGHT:
+            self.movement[1] = True
+        if action == Action.JUMP:
+            self.handle_jump()
+        if action == Action.SWING:
+            self.handle_swing()
+
+    def release(self, action: Action) -> None:
+        ''' Ends a player action: stops walking or lets go of the trapeze '''
+        if self.recording:
+            self.recording.record(self.step_count, action, False)
+        if action == Action.LEFT:
             self.movement[0] = False
-        if event.key == pygame.K_RIGHT:
+        if action == Action.RIGHT:
             self.movement[1] = False
-        if event.key == pygame.K_SPACE and self.acrobat.trapeze:
+        if action == Action.SWING and self.acrobat.trapeze:
             self.acrobat.trapeze.detach_entity()
+            self.acrobat.trapeze = None
 
 
     def handle_gameover(self) -> None:
         ''' Used for saving max record if set or saving game if needed '''
         self.record = max(self.record, self.score)
+        self.save_recording()
         caretaker.save_game(self.acrobat.pos[0], self.acrobat.pos[1], self.score, self.record, True)
 
 
@@ -303,8 +558,11 @@ class Trapezirque:
     def run_game_over(self) -> None:
         ''' Runs the game over settings and event checking. If closing the tab or restarting the game'''
         play_music(self, 'game_over')
+        self.display.blit(self.assets['game_over'], (0,0))
+        self.update_display()
         while True:
             for event in pygame.event.get():
+                self.presenter.handle_event(event)
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     sys.exit()
@@ -312,8 +570,8 @@ class Trapezirque:
                     if event.key == pygame.K_RETURN:
                         Trapezirque().run()
 
-            self.display.blit(self.assets['game_over'], (0,0))
-            self.update_display()
+            # the screen is static, nothing is presented unless the window was covered
+            self.update_display(dirty=[])
 
 
     #Memento load and save
@@ -321,6 +579,7 @@ class Trapezirque:
         ''' Memento method that loads the game when the user hits "r" on the intro screen'''
         memento = caretaker.load_game()
         if memento:
+            self.prepare_play()
             player_x, player_y, player_score = memento.get_saved_state()
             self.acrobat.pos[0] = player_x
             self.acrobat.pos[1] = player_y
@@ -333,22 +592,35 @@ class Trapezirque:
     
 
     #shared methods
-    def update_display(self) -> None:
-        ''' Encarge of updating the screen of the game'''
-        self.screen.blit(pygame.transform.scale(self.display, self.screen.get_size()), (0,0))
-        pygame.display.update()
-        self.clock.tick(60)
+    def update_display(self, fps: int =FPS, dirty: list =None) -> None:
+        ''' Encarge of updating the screen of the game, capped at fps frames per second (0 for uncapped).
+        With dirty set only those display rects are presented '''
+        self.presenter.present(dirty)
+        if self.first_frame_time is None:
+            self.first_frame_time = time.perf_counter() - self.started
+            print(f'First frame after {self.first_frame_time * 1000:.0f} ms')
+        self.clock.tick(fps)
 
     def quit_game(self) -> None:
         ''' When closing the tab or exiting the game '''
+        self.save_recording()
         pygame.quit()
         sys.exit()
 
 
 #main 
-game = Trapezirque()
-caretaker = GameCaretaker(game)
-game.run()
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--replay':
+        # python scripts/game.py --replay recording.json [--realtime]
+        recording = Recording.load(sys.argv[2])
+        realtime = '--realtime' in sys.argv
+        game = Trapezirque(headless=not realtime, seed=recording.seed, replaying=True)
+        game.replay(recording, realtime)
+        print(game.state())
+    else:
+        game = Trapezirque()
+        caretaker = GameCaretaker(game)
+        game.run()
 
 
 
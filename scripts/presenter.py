@@ -0,0 +1,59 @@
+import pygame
+
+EXPOSE_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+
+
+class Presenter:
+    ''' Presents the low resolution display on the window. The display is scaled straight into the window
+    surface, so no frame-sized surface is allocated per frame, and a frame can be limited to the areas of the 
+    display that changed. '''
+
+    def __init__(self, display: pygame.Surface, screen: pygame.Surface) -> None:
+        self.display: pygame.Surface = display
+        self.screen: pygame.Surface = screen
+        self.scale_x: float = screen.get_width() / display.get_width()
+        self.scale_y: float = screen.get_height() / display.get_height()
+        self.stale: bool = True
+
+    def handle_event(self, event) -> None:
+        ''' The whole window has to be presented again after it was covered '''
+        if event.type in EXPOSE_EVENTS:
+            self.stale = True
+
+    def present(self, dirty: list = None) -> None:
+        ''' Presents the whole display, or only the dirty rects (in display coordinates) when a list is given. 
+        An empty list presents nothing, unless the window needs a full present anyway '''
+        if dirty is None or self.stale:
+            pygame.transform.scale(self.display, self.screen.get_size(), self.screen)
+            pygame.display.update()
+            self.stale = False
+            return
+        screen_rects = []
+        for rect in dirty:
+            rect = rect.clip(self.display.get_rect())
+            if not rect.width or not rect.height:
+                continue
+            screen_rect = self.to_screen(rect)
+            pygame.transform.scale(self.display.subsurface(rect), screen_rect.size, self.screen.subsurface(screen_rect))
+            screen_rects.append(screen_rect)
+        if screen_rects:
+            pygame.display.update(screen_rects)
+
+    def to_screen(self, rect: pygame.Rect) -> pygame.Rect:
+        ''' Helper method to map a display rect to the window, exact for integer scale factors '''
+        left = int(rect.left * self.scale_x)
+        top = int(rect.top * self.scale_y)
+        return pygame.Rect(left, top, int(rect.right * self.scale_x) - left, int(rect.bottom * self.scale_y) - top)
+
+    @staticmethod
+    def changed_area(before: pygame.Surface, after: pygame.Surface) -> pygame.Rect:
+        ''' Returns the bounding rect of the pixels that differ between two surfaces of the same size '''
+        difference = before.copy()
+        difference.set_colorkey(None)
+        difference.blit(after, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        reverse = after.copy()
+        reverse.set_colorkey(None)
+        reverse.blit(before, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        difference.blit(reverse, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+        difference.set_colorkey((0, 0, 0))
+        return difference.get_bounding_rect()
@@ -0,0 +1,52 @@
+import json
+
+from events import Action
+
+VERSION = 1
+
+#   A recording is one JSON object:
+#   {"version": 1, "seed": int, "start": {"pos": [x, y], "score": int}, "steps": int, "inputs": [[step, action, pressed], ...]}
+#   Only presses and releases are stored, each stamped with the simulation step it was applied before, so a
+#   session that idles for minutes still takes a few bytes.
+
+
+class Recording:
+    ''' Everything needed to re-run a session: the seed of the game´s RNG, the state the simulation started from
+    and the player´s actions '''
+
+    def __init__(self, seed: int, start: dict = None, steps: int = 0, inputs: list = None) -> None:
+        self.seed: int = seed
+        self.start: dict = start if start is not None else {}
+        self.steps: int = steps
+        self.inputs: list = inputs if inputs is not None else []
+
+    def begin(self, pos: list, score: int) -> None:
+        ''' Stores the state the simulation starts from, which a loaded game can change '''
+        self.start = {'pos': list(pos), 'score': score}
+
+    def record(self, step: int, action: Action, pressed: bool) -> None:
+        ''' Stores an action pressed or released before the given simulation step '''
+        self.inputs.append((step, action, pressed))
+
+    def inputs_by_step(self) -> dict:
+        ''' Returns {step: [(action, pressed), ...]} in recorded order '''
+        by_step = {}
+        for step, action, pressed in self.inputs:
+            by_step.setdefault(step, []).append((action, pressed))
+        return by_step
+
+    def save(self, path: str) -> None:
+        ''' Writes the recording as JSON '''
+        with open(path, 'w') as f:
+            json.dump({'version': VERSION, 'seed': self.seed, 'start': self.start, 'steps': self.steps,
+                       'inputs': [[step, action.value, int(pressed)] for step, action, pressed in self.inputs]}, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'Recording':
+        ''' Reads a recording written by save '''
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != VERSION:
+            raise ValueError(f'{path} is not a version {VERSION} recording')
+        inputs = [(step, Action(action), bool(pressed)) for step, action, pressed in data['inputs']]
+        return cls(data['seed'], data['start'], data['steps'], inputs)
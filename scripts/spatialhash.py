@@ -0,0 +1,71 @@
+import pygame
+
+
+class SpatialHash:
+    ''' Uniform grid used as collision broadphase. Objects are bucketed into the cells their rect covers, so an
+    overlap query only looks at the objects registered near the queried rect. '''
+
+    def __init__(self, cell_size: int = 64) -> None:
+        self.cell_size: int = cell_size
+        self.cells: dict = {}
+        self.objects: dict = {}
+        self.inserted: int = 0
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def __contains__(self, obj) -> bool:
+        return obj in self.objects
+
+    def cell_range(self, rect: pygame.Rect) -> tuple:
+        ''' Returns the (first_x, first_y, last_x, last_y) cells covered by a rect '''
+        return (rect.left // self.cell_size, rect.top // self.cell_size,
+                (rect.right - 1) // self.cell_size, (rect.bottom - 1) // self.cell_size)
+
+    def insert(self, obj, rect: pygame.Rect) -> None:
+        ''' Registers an object with its current rect '''
+        area = self.cell_range(rect)
+        self.objects[obj] = [area, self.inserted]
+        self.inserted += 1
+        self.add_to_cells(obj, area)
+
+    def move(self, obj, rect: pygame.Rect) -> None:
+        ''' Updates the rect of a registered object, only touching the buckets when it changes cells '''
+        entry = self.objects[obj]
+        area = self.cell_range(rect)
+        if area != entry[0]:
+            self.remove_from_cells(obj, entry[0])
+            self.add_to_cells(obj, area)
+            entry[0] = area
+
+    def remove(self, obj) -> None:
+        ''' Unregisters an object '''
+        area, _ = self.objects.pop(obj)
+        self.remove_from_cells(obj, area)
+
+    def query(self, rect: pygame.Rect) -> list:
+        ''' Returns the objects registered in the cells a rect covers, in insertion order. These are only
+        candidates, callers still test the exact overlap. '''
+        found = {}
+        first_x, first_y, last_x, last_y = self.cell_range(rect)
+        for cell_y in range(first_y, last_y + 1):
+            for cell_x in range(first_x, last_x + 1):
+                bucket = self.cells.get((cell_x, cell_y))
+                if bucket:
+                    found.update(bucket)
+        return sorted(found, key=lambda obj: self.objects[obj][1])
+
+    def add_to_cells(self, obj, area: tuple) -> None:
+        ''' Helper method to add an object to the buckets of an area '''
+        for cell_y in range(area[1], area[3] + 1):
+            for cell_x in range(area[0], area[2] + 1):
+                self.cells.setdefault((cell_x, cell_y), {})[obj] = None
+
+    def remove_from_cells(self, obj, area: tuple) -> None:
+        ''' Helper method to remove an object from the buckets of an area, dropping empty buckets '''
+        for cell_y in range(area[1], area[3] + 1):
+            for cell_x in range(area[0], area[2] + 1):
+                bucket = self.cells[(cell_x, cell_y)]
+                del bucket[obj]
+                if not bucket:
+                    del self.cells[(cell_x, cell_y)]
@@ -0,0 +1,34 @@
+import pygame
+from collections import OrderedDict
+
+MAX_TEXT_SURFACES = 64
+
+
+class TextCache:
+    ''' Keeps fonts alive and memoizes rendered text. Surfaces are keyed by (font, text, color) and the least
+    recently used ones are dropped once there are more than max_surfaces '''
+
+    def __init__(self, max_surfaces: int = MAX_TEXT_SURFACES) -> None:
+        self.max_surfaces: int = max_surfaces
+        self.fonts: dict = {}
+        self.surfaces: OrderedDict = OrderedDict()
+
+    def font(self, size: int, name: str = None) -> pygame.font.Font:
+        ''' Returns the font of a given file (the default font for None) and size, loading it once '''
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = self.fonts[key] = pygame.font.Font(name, size)
+        return font
+
+    def render(self, text: str, size: int, color: tuple, name: str = None, antialias: bool = True) -> pygame.Surface:
+        ''' Returns the rendered text, only rasterizing it the first time it is asked for '''
+        key = (name, size, text, color, antialias)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = self.font(size, name).render(text, antialias, color)
+            if len(self.surfaces) > self.max_surfaces:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
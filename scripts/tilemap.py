@@ -1,5 +1,9 @@
 import pygame
 import json
+import queue
+import threading
+from collections import OrderedDict
+from binarymap import BinaryMap
 
 NEIGHBOR_TILES = [(-1,-1),(0,-1),(1,-1),(1,0),(1,1),(0,1),(-1,1),(-1,0),(0,0)]
 #   - 1  0  1
@@ -7,66 +11,367 @@ NEIGHBOR_TILES = [(-1,-1),(0,-1),(1,-1),(1,0),(1,1),(0,1),(-1,1),(-1,0),(0,0)]
 #   0 x  x  x 
 #   1 x  x  x
 PHYSICS_TILES = {'floor','circus'}
+CHUNK_SIZE = 16
+MAX_BAKED_CHUNKS = 64
+BINARY_MAP_EXTENSION = '.bin'
+MAX_STREAMED_CHUNKS = 48
+STREAM_AHEAD_CHUNKS = 2
 
 class Tilemap:
     
-    '''A class to represent a tilemap in a game. Each tile is assumed to be 16x16 pixels by default.'''
+    '''A class to represent a tilemap in a game. Each tile is assumed to be 16x16 pixels by default.
+    Tiles are also bucketed into CHUNK_SIZE x CHUNK_SIZE chunks so rendering only touches what the camera sees.
+    With bake=True each ongrid chunk is pre-rendered into a single surface, keeping at most max_baked LRU chunks.
+    The "x;y" keyed tilemap is kept for saving; lookups go through the (x, y) keyed grid built at load time.
+    Tiles are also indexed by (type, variant) so extracting spawners only touches the matching tiles.
+    Collision rects are cached per chunk row, one rect per horizontal run of solid tiles.
+    Binary maps are memory-mapped and their chunks are only materialized once something touches them.
+    With stream=True a background thread prefetches the chunks ahead of the camera and idle chunks far from it 
+    are evicted once more than stream_budget chunks are resident.'''
     
-    def __init__(self, game, tile_size: int =16) -> None:
+    def __init__(self, game, tile_size: int =16, bake: bool =False, max_baked: int =MAX_BAKED_CHUNKS,
+                 stream: bool =False, stream_budget: int =MAX_STREAMED_CHUNKS, stream_ahead: int =STREAM_AHEAD_CHUNKS) -> None:
         self.game = game
         self.tile_size: int = tile_size
         self.tilemap : dict = {}
         self.offgrid_tiles: list = []
+        self.grid: dict = {}
+        self.solid_tiles: set = set()
+        self.tile_index: dict = {}
+        self.offgrid_index: dict = {}
+        self.solid_spans: dict = {}
+        self.window_spans: dict = {}
+        self.solid_version: int = 0
+        self.chunks: dict = {}
+        self.offgrid_chunks: dict = {}
+        self.bake: bool = bake
+        self.max_baked: int = max_baked
+        self.baked_chunks: OrderedDict = OrderedDict()
+        self.level: BinaryMap = None
+        self.loaded_chunks: set = set()
+        self.stream: bool = stream
+        self.stream_budget: int = stream_budget
+        self.stream_ahead: int = stream_ahead
+        self.stream_thread: threading.Thread = None
+        self.stream_requests: queue.Queue = None
+        self.stream_ready: queue.Queue = None
+        self.stream_pending: set = set()
+        self.stream_tick: int = 0
+        self.stream_direction: int = 1
+        self.stream_last_x: float = 0
+        self.chunk_touched: dict = {}
+        self.spawn_ids: list = []
+        self.spawn_callback = None
+        self.spawned_chunks: set = set()
 
     def extract(self, id_pairs: list, keep: bool =False) -> list:
         ''' Extracts tiles matching the given id_pairs from the tilemap '''
         matches = []
+        id_pairs = list(dict.fromkeys(id_pairs))
+        self.ensure_tiles(id_pairs)
         
         self.build_offgrid(id_pairs, matches, keep)
         self.build_ongrid(id_pairs, matches, keep)      
         
         return matches
     
+    def extract_offgrid(self, id_pairs: list, keep: bool =False) -> list:
+        ''' Extracts only the offgrid tiles matching the given id_pairs, without materializing any chunk '''
+        matches = []
+        self.build_offgrid(list(dict.fromkeys(id_pairs)), matches, keep)
+        return matches
+
     def build_offgrid(self, id_pairs: list, matches: list, keep) -> None:
         ''' Helper method to extract tiles from offgrid_tiles. '''
-        for tile in self.offgrid_tiles.copy():
-            if(tile['type'], tile['variant']) in id_pairs:
+        extracted = []
+        for pair in id_pairs:
+            for tile in self.offgrid_index.get(pair, ()):
                 matches.append(tile.copy())
-                if not keep:
-                    self.offgrid_tiles.remove(tile)
+                extracted.append(tile)
+            if not keep:
+                self.offgrid_index.pop(pair, None)
+
+        if extracted and not keep:
+            removed = set(map(id, extracted))
+            self.offgrid_tiles = [tile for tile in self.offgrid_tiles if id(tile) not in removed]
+            for tile in extracted:
+                self.offgrid_chunks[self.offgrid_chunk_of(tile)].remove(tile)
                     
     def build_ongrid(self, id_pairs: list, matches: list, keep) -> None:
         ''' Helper method to extract tiles from the main tilemap. '''
-        for loc in self.tilemap.copy():
-            tile = self.tilemap[loc]
-            if(tile['type'], tile['variant']) in id_pairs:
+        for pair in id_pairs:
+            for loc, tile in list(self.tile_index.get(pair, {}).items()):
                 matches.append(tile.copy())
                 matches[-1]['pos'] = matches[-1]['pos'].copy()
                 matches[-1]['pos'][0] *= self.tile_size
                 matches[-1]['pos'][1] *= self.tile_size
                 if not keep:
-                    del self.tilemap[loc]
-        
+                    self.remove_tile(loc, tile)
+                    self.baked_chunks.pop(self.ongrid_chunk_of(tile), None)
+
+    def grid_loc(self, tile: dict) -> tuple:
+        ''' Returns the (x, y) grid key of an ongrid tile. '''
+        return (int(tile['pos'][0]), int(tile['pos'][1]))
+
+    def index_grid(self) -> None:
+        ''' Rebuilds the (x, y) grid, the set of solid locations and the (type, variant) indexes. '''
+        self.grid = {}
+        self.solid_tiles = set()
+        self.solid_spans = {}
+        self.window_spans = {}
+        self.solid_version += 1
+        self.tile_index = {}
+        for key, tile in self.tilemap.items():
+            loc = self.grid_loc(tile)
+            self.grid[loc] = tile
+            if tile['type'] in PHYSICS_TILES:
+                self.solid_tiles.add(loc)
+            self.tile_index.setdefault((tile['type'], tile['variant']), {})[key] = tile
+        self.offgrid_index = {}
+        for tile in self.offgrid_tiles:
+            self.offgrid_index.setdefault((tile['type'], tile['variant']), []).append(tile)
+
+    def add_tile(self, tile: dict) -> None:
+        ''' Adds an ongrid tile to the tilemap and to every index. '''
+        loc = self.grid_loc(tile)
+        key = str(loc[0]) + ';' + str(loc[1])
+        self.tilemap[key] = tile
+        self.grid[loc] = tile
+        if tile['type'] in PHYSICS_TILES:
+            self.solid_tiles.add(loc)
+            self.forget_spans(loc[0] // CHUNK_SIZE, loc[1])
+            self.solid_version += 1
+        self.tile_index.setdefault((tile['type'], tile['variant']), {})[key] = tile
+        self.chunks.setdefault(self.ongrid_chunk_of(tile), {})[key] = tile
+
+    def remove_tile(self, key: str, tile: dict) -> None:
+        ''' Removes an ongrid tile from the tilemap and from every index. '''
+        loc = self.grid_loc(tile)
+        del self.tilemap[key]
+        del self.grid[loc]
+        if loc in self.solid_tiles:
+            self.solid_tiles.discard(loc)
+            self.forget_spans(loc[0] // CHUNK_SIZE, loc[1])
+            self.solid_version += 1
+        del self.tile_index[(tile['type'], tile['variant'])][key]
+        del self.chunks[self.ongrid_chunk_of(tile)][key]
+
+    def forget_spans(self, chunk_x: int, y: int) -> None:
+        ''' Drops the cached collision rects of a chunk row, so they are rebuilt on next use. '''
+        self.solid_spans.pop((chunk_x, y), None)
+        self.window_spans.pop((chunk_x, y), None)
+
+    def ensure_chunk(self, chunk: tuple) -> None:
+        ''' Materializes a chunk of the binary level the first time it is needed. '''
+        if self.level:
+            if chunk not in self.loaded_chunks:
+                self.integrate_chunk(chunk, self.read_chunk(self.level, chunk))
+            if self.stream:
+                self.chunk_touched[chunk] = self.stream_tick
+
+    def ensure_tiles(self, id_pairs: list) -> None:
+        ''' Materializes the chunks of the binary level that hold tiles matching id_pairs. '''
+        if self.level:
+            for loc in self.level.find(id_pairs):
+                self.ensure_chunk((loc[0] // CHUNK_SIZE, loc[1] // CHUNK_SIZE))
+
+    def read_chunk(self, level: BinaryMap, chunk: tuple) -> list:
+        ''' Decodes the tiles of a chunk from a binary level. '''
+        first_x = chunk[0] * CHUNK_SIZE
+        first_y = chunk[1] * CHUNK_SIZE
+        return level.tiles_in(first_x, first_y, first_x + CHUNK_SIZE, first_y + CHUNK_SIZE)
+
+    def integrate_chunk(self, chunk: tuple, tiles: list) -> None:
+        ''' Adds the decoded tiles of a chunk. Spawner tiles go to the spawn callback instead, the first time only. '''
+        self.loaded_chunks.add(chunk)
+        first_load = chunk not in self.spawned_chunks
+        for tile in tiles:
+            if self.spawn_callback and (tile['type'], tile['variant']) in self.spawn_ids:
+                if first_load:
+                    spawner = tile.copy()
+                    spawner['pos'] = [tile['pos'][0] * self.tile_size, tile['pos'][1] * self.tile_size]
+                    self.spawn_callback(spawner)
+                continue
+            self.add_tile(tile)
+        if self.spawn_callback:
+            self.spawned_chunks.add(chunk)
+
+    def unload_chunk(self, chunk: tuple) -> None:
+        ''' Drops every tile of a chunk so it is read from the binary level again when needed. '''
+        for key, tile in list(self.chunks.get(chunk, {}).items()):
+            self.remove_tile(key, tile)
+        self.chunks.pop(chunk, None)
+        for y in range(chunk[1] * CHUNK_SIZE, (chunk[1] + 1) * CHUNK_SIZE):
+            self.forget_spans(chunk[0], y)
+        self.baked_chunks.pop(chunk, None)
+        self.loaded_chunks.discard(chunk)
+        self.chunk_touched.pop(chunk, None)
+
+    def stream_spawners(self, id_pairs: list, callback) -> None:
+        ''' Hands spawner tiles matching id_pairs to callback as their chunks are materialized, instead of 
+        keeping them as tiles to be extracted. '''
+        self.spawn_ids = id_pairs
+        self.spawn_callback = callback
+
+    def start_stream(self) -> None:
+        ''' Starts the background thread that decodes requested chunks of the binary level. '''
+        self.stream_requests = queue.Queue()
+        self.stream_ready = queue.Queue()
+        self.stream_pending = set()
+        self.stream_thread = threading.Thread(target=self.stream_worker, args=(self.level, self.stream_requests, self.stream_ready), daemon=True)
+        self.stream_thread.start()
+
+    def stop_stream(self) -> None:
+        ''' Stops the background thread, waiting for the chunk it may be decoding. '''
+        if self.stream_thread:
+            self.stream_requests.put(None)
+            self.stream_thread.join()
+        self.stream_thread = None
+
+    def stream_worker(self, level: BinaryMap, requests: queue.Queue, ready: queue.Queue) -> None:
+        ''' Background loop: decodes each requested chunk and queues its tiles for the main thread. '''
+        while True:
+            chunk = requests.get()
+            if chunk is None:
+                return
+            ready.put((chunk, self.read_chunk(level, chunk)))
+
+    def update_stream(self, surf, offset) -> None:
+        ''' Called once per frame: adds the chunks decoded in the background, requests the chunks ahead of the 
+        camera in the scroll direction and evicts idle chunks when over the budget. '''
+        if not (self.stream and self.level):
+            return
+        self.stream_tick += 1
+
+        while not self.stream_ready.empty():
+            chunk, tiles = self.stream_ready.get_nowait()
+            self.stream_pending.discard(chunk)
+            if chunk not in self.loaded_chunks:
+                self.integrate_chunk(chunk, tiles)
+
+        if offset[0] != self.stream_last_x:
+            self.stream_direction = 1 if offset[0] > self.stream_last_x else -1
+            self.stream_last_x = offset[0]
+
+        visible = self.visible_chunks(surf, offset)
+        first_x, first_y = visible[0]
+        last_x, last_y = visible[-1]
+        if self.stream_direction > 0:
+            ahead_x = range(last_x + 1, last_x + 1 + self.stream_ahead)
+        else:
+            ahead_x = range(first_x - self.stream_ahead, first_x)
+        ahead = [(x, y) for y in range(first_y, last_y + 1) for x in ahead_x]
+
+        for chunk in ahead:
+            if chunk not in self.loaded_chunks and chunk not in self.stream_pending:
+                self.stream_pending.add(chunk)
+                self.stream_requests.put(chunk)
+
+        center = ((first_x + last_x) / 2, (first_y + last_y) / 2)
+        self.evict_chunks(set(visible + ahead), center)
+
+    def evict_chunks(self, keep: set, center: tuple) -> None:
+        ''' Unloads the chunks farthest from center until the budget is met. Chunks in keep or touched during 
+        the last frame (something still stands on them) are never evicted. '''
+        if len(self.loaded_chunks) <= self.stream_budget:
+            return
+        idle = [chunk for chunk in self.loaded_chunks 
+                if chunk not in keep and self.chunk_touched.get(chunk, -1) < self.stream_tick - 1]
+        idle.sort(key=lambda chunk: abs(chunk[0] - center[0]) + abs(chunk[1] - center[1]))
+        while idle and len(self.loaded_chunks) > self.stream_budget:
+            self.unload_chunk(idle.pop())
+
+    def ensure_area(self, first_x: int, first_y: int, last_x: int, last_y: int) -> None:
+        ''' Materializes every chunk overlapping the given tile area, end inclusive. '''
+        for chunk_y in range(first_y // CHUNK_SIZE, last_y // CHUNK_SIZE + 1):
+            for chunk_x in range(first_x // CHUNK_SIZE, last_x // CHUNK_SIZE + 1):
+                self.ensure_chunk((chunk_x, chunk_y))
+
+    def ongrid_chunk_of(self, tile: dict) -> tuple:
+        ''' Returns the chunk coordinate of an ongrid tile (its pos is in tiles). '''
+        return (int(tile['pos'][0] // CHUNK_SIZE), int(tile['pos'][1] // CHUNK_SIZE))
+
+    def offgrid_chunk_of(self, tile: dict) -> tuple:
+        ''' Returns the chunk coordinate of an offgrid tile (its pos is in pixels). '''
+        chunk_px = self.tile_size * CHUNK_SIZE
+        return (int(tile['pos'][0] // chunk_px), int(tile['pos'][1] // chunk_px))
+
+    def index_chunks(self) -> None:
+        ''' Rebuilds the chunk index from tilemap and offgrid_tiles. '''
+        self.chunks = {}
+        for loc, tile in self.tilemap.items():
+            self.chunks.setdefault(self.ongrid_chunk_of(tile), {})[loc] = tile
+        self.offgrid_chunks = {}
+        for tile in self.offgrid_tiles:
+            self.offgrid_chunks.setdefault(self.offgrid_chunk_of(tile), []).append(tile)
+
+    def visible_chunks(self, surf, offset) -> list:
+        ''' Returns the chunk coordinates that intersect the camera rectangle. 
+        The range starts one tile early so offgrid tiles hanging over a chunk border are still drawn. '''
+        chunk_px = self.tile_size * CHUNK_SIZE
+        first_x = int((offset[0] - self.tile_size) // chunk_px)
+        first_y = int((offset[1] - self.tile_size) // chunk_px)
+        last_x = int((offset[0] + surf.get_width()) // chunk_px)
+        last_y = int((offset[1] + surf.get_height()) // chunk_px)
+        return [(x, y) for y in range(first_y, last_y + 1) for x in range(first_x, last_x + 1)]
+
+    def bake_chunks(self) -> None:
+        ''' Pre-renders ongrid chunks into cached surfaces, up to max_baked of them. '''
+        self.baked_chunks = OrderedDict()
+        for chunk in list(self.chunks)[:self.max_baked]:
+            self.bake_chunk(chunk)
+
+    def bake_chunk(self, chunk: tuple) -> pygame.Surface:
+        ''' Renders every tile of a chunk into one surface and stores it, evicting the least recently used chunk. '''
+        chunk_px = self.tile_size * CHUNK_SIZE
+        baked = pygame.Surface((chunk_px, chunk_px)).convert()
+        for tile in self.chunks[chunk].values():
+            pos_x = tile['pos'][0] * self.tile_size - chunk[0] * chunk_px
+            pos_y = tile['pos'][1] * self.tile_size - chunk[1] * chunk_px
+            baked.blit(self.game.assets[tile['type']][tile['variant']], (pos_x, pos_y))
+        baked.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+
+        self.baked_chunks[chunk] = baked
+        if len(self.baked_chunks) > self.max_baked:
+            self.baked_chunks.popitem(last=False)
+        return baked
+
+    def baked_chunk(self, chunk: tuple) -> pygame.Surface:
+        ''' Returns the cached surface of a chunk, baking it again if it was evicted. '''
+        if chunk in self.baked_chunks:
+            self.baked_chunks.move_to_end(chunk)
+            return self.baked_chunks[chunk]
+        return self.bake_chunk(chunk)
         
     def tiles_around(self, pos: tuple) -> None:
         ''' Returns a list of tiles surrounding a given position. '''
         tiles = []
-        tile_loc = (int(pos[0] // self.tile_size),int(pos[1] // self.tile_size))
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        if self.level:
+            self.ensure_area(tile_x - 1, tile_y - 1, tile_x + 1, tile_y + 1)
         for offset in NEIGHBOR_TILES:
-            check_lock = str(tile_loc[0] + offset[0]) + ';' + str(tile_loc[1] + offset[1])
-            if check_lock in self.tilemap:
-                tiles.append(self.tilemap[check_lock])
+            tile = self.grid.get((tile_x + offset[0], tile_y + offset[1]))
+            if tile:
+                tiles.append(tile)
         return tiles
     
     def save(self, path: str) -> None:
         ''' Saves the current state of the tilemap to a file. '''
         print('saving')
+        if self.level:
+            first_x, first_y, last_x, last_y = self.level.bounds()
+            self.ensure_area(first_x, first_y, last_x - 1, last_y - 1)
         f = open(path, 'w')
         json.dump({'tilemap': self.tilemap, 'tile_size': self.tile_size, 'offgrid': self.offgrid_tiles}, f)
         f.close()
 
     def load(self, path: str) -> None:
         ''' Loads a tilemap from a file. '''
+        if path.endswith(BINARY_MAP_EXTENSION):
+            self.load_binary(path)
+            return
+        self.close_level()
         f = open(path, 'r')
         map_data = json.load(f)
         f.close
@@ -74,45 +379,129 @@ class Tilemap:
         self.tilemap = map_data['tilemap']
         self.tile_size = map_data['tile_size']
         self.offgrid_tiles= map_data['offgrid']
+        self.index_grid()
+        self.index_chunks()
+        # chunks are baked by bake_chunks, or on first render
+        self.baked_chunks = OrderedDict()
+
+    def load_binary(self, path: str) -> None:
+        ''' Opens a binary map written by binarymap.convert. Only the header and offgrid tiles are read now. '''
+        self.close_level()
+        self.level = BinaryMap(path)
+        self.tile_size = self.level.tile_size
+        self.tilemap = {}
+        self.offgrid_tiles = self.level.offgrid_tiles()
+        self.index_grid()
+        self.index_chunks()
+        self.baked_chunks = OrderedDict()
+        if self.stream:
+            self.start_stream()
+
+    def close_level(self) -> None:
+        ''' Closes the binary map currently backing the tilemap, if any. '''
+        self.stop_stream()
+        if self.level:
+            self.level.close()
+        self.level = None
+        self.loaded_chunks = set()
+        self.spawned_chunks = set()
+        self.chunk_touched = {}
 
     def solid_check(self, pos) -> dict:
         ''' Checks if a tile at a given position is solid. '''
-        tile_loc = str(int(pos[0] // self.tile_size)) + ';' + str(int(pos[1] // self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]['type'] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
+        if self.level:
+            self.ensure_chunk((tile_loc[0] // CHUNK_SIZE, tile_loc[1] // CHUNK_SIZE))
+        if tile_loc in self.solid_tiles:
+            return self.grid[tile_loc]
 
 
-    def physics_recs_around(self, pos: tuple) -> list:
-        ''' Returns a list of rectangles for physics interactions around a given position. '''
+    def physics_recs_around(self, pos: tuple, area: pygame.Rect =None) -> list:
+        ''' Returns the rectangles for physics interactions around a given position. The rects are cached and 
+        shared, so they must not be modified. Spans are clipped to the 3x3 tiles around the position, so a 
+        collision never pushes further than those tiles would. When area is given only the rects overlapping 
+        it are returned. '''
+        tile_x = int(pos[0] // self.tile_size)
+        tile_y = int(pos[1] // self.tile_size)
+        if self.level:
+            self.ensure_area(tile_x - 1, tile_y - 1, tile_x + 1, tile_y + 1)
+        left = (tile_x - 1) * self.tile_size
+        right = (tile_x + 2) * self.tile_size
         recs = []
-        for tile in self.tiles_around(pos):
-            if tile['type'] in PHYSICS_TILES:
-                left = tile['pos'][0] * self.tile_size
-                top = tile['pos'][1] * self.tile_size
-                width = self.tile_size
-                height = self.tile_size
-                recs.append(pygame.Rect(left, top, width, height))
+        for y in range(tile_y - 1, tile_y + 2):
+            for chunk_x in range((tile_x - 1) // CHUNK_SIZE, (tile_x + 1) // CHUNK_SIZE + 1):
+                for rect in self.spans_in_window(chunk_x, y, left, right):
+                    if area is None or rect.colliderect(area):
+                        recs.append(rect)
+        return recs
+
+    def spans_in_window(self, chunk_x: int, y: int, left: int, right: int) -> list:
+        ''' Returns the collision rects of a chunk row that overlap the pixels [left, right), clipped to them.
+        The clipped pieces are cached per window like the spans themselves. '''
+        windows = self.window_spans.setdefault((chunk_x, y), {})
+        recs = windows.get(left)
+        if recs is None:
+            recs = windows[left] = []
+            for rect in self.spans_of(chunk_x, y):
+                if rect.right <= left or rect.left >= right:
+                    continue
+                if rect.left < left or rect.right > right:
+                    rect = pygame.Rect(max(rect.left, left), rect.top, min(rect.right, right) - max(rect.left, left), rect.height)
+                recs.append(rect)
         return recs
 
+    def spans_of(self, chunk_x: int, y: int) -> list:
+        ''' Returns the cached collision rects of a chunk row, building them on first use. '''
+        spans = self.solid_spans.get((chunk_x, y))
+        if spans is None:
+            spans = self.solid_spans[(chunk_x, y)] = self.build_spans(chunk_x, y)
+        return spans
+
+    def build_spans(self, chunk_x: int, y: int) -> list:
+        ''' Merges each horizontal run of solid tiles in a chunk row into a single rect. '''
+        spans = []
+        first_x = chunk_x * CHUNK_SIZE
+        start = None
+        for x in range(first_x, first_x + CHUNK_SIZE + 1):
+            solid = x < first_x + CHUNK_SIZE and (x, y) in self.solid_tiles
+            if solid and start is None:
+                start = x
+            elif not solid and start is not None:
+                spans.append(pygame.Rect(start * self.tile_size, y * self.tile_size, (x - start) * self.tile_size, self.tile_size))
+                start = None
+        return spans
+
     def render(self, surf, offset=(0,0)) -> None:
-        ''' Renders the tilemap onto a given surface. '''
-        self.render_offgrid(surf, offset)  
-        self.render_ongrid(surf, offset)  
+        ''' Renders the tilemap chunks visible on a given surface. '''
+        visible = self.visible_chunks(surf, offset)
+        if self.level:
+            for chunk in visible:
+                self.ensure_chunk(chunk)
+        self.render_offgrid(surf, offset, visible)  
+        self.render_ongrid(surf, offset, visible)  
         
-    def render_offgrid(self, surf, offset) -> None:
+    def render_offgrid(self, surf, offset, visible) -> None:
         '''Helper method to render offgrid tiles.'''
-        for tile in self.offgrid_tiles:
-            pos_x = tile['pos'][0] - offset[0]
-            pos_y = tile['pos'][1] - offset[1]
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (pos_x,pos_y))[tile['variant']]
+        for chunk in visible:
+            for tile in self.offgrid_chunks.get(chunk, ()):
+                pos_x = tile['pos'][0] - offset[0]
+                pos_y = tile['pos'][1] - offset[1]
+                surf.blit(self.game.assets[tile['type']][tile['variant']], (pos_x,pos_y))
             
-    def render_ongrid(self, surf, offset) -> None:
+    def render_ongrid(self, surf, offset, visible) -> None:
         ''' Helper method to render ongrid tiles. '''
-        for loc in self.tilemap:
-            tile = self.tilemap[loc]
-            pos_x = tile['pos'][0] * self.tile_size - offset[0]
-            pos_y = tile['pos'][1] * self.tile_size - offset[1]
-            surf.blit(self.game.assets[tile['type']][tile['variant']], (pos_x,pos_y ))
-        
-        
\ No newline at end of file
+        if self.bake:
+            self.render_baked(surf, offset, visible)
+            return
+        for chunk in visible:
+            for tile in self.chunks.get(chunk, {}).values():
+                pos_x = tile['pos'][0] * self.tile_size - offset[0]
+                pos_y = tile['pos'][1] * self.tile_size - offset[1]
+                surf.blit(self.game.assets[tile['type']][tile['variant']], (pos_x,pos_y ))
+
+    def render_baked(self, surf, offset, visible) -> None:
+        ''' Helper method to render ongrid tiles from the baked chunk surfaces. '''
+        chunk_px = self.tile_size * CHUNK_SIZE
+        for chunk in visible:
+            if self.chunks.get(chunk):
+                surf.blit(self.baked_chunk(chunk), (chunk[0] * chunk_px - offset[0], chunk[1] * chunk_px - offset[1]))
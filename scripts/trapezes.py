@@ -1,14 +1,27 @@
 import pygame
 import math as m
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class Trapeze:
-    ''' Create a trapeze object '''
+    ''' Create a trapeze object. The end point of the rope is cached and only recomputed when the angle changes '''
     ANGLE = 5.5
     ANGULAR_VELOCITY = -0.002
     GRAVITY = 0.01
     VERTICAL_VELOCITY = 0   
     LINE_WIDTH = 4
+    SWING_GRAVITY = 0.3
+    MAX_ANGULAR_VELOCITY = 0.1
+    MAX_ANGLE_STEP = 0.3
+    SPRITE_STEPS = 256
+    SPRITE_COLORKEY = (0, 0, 0)
+    sprites: dict = {}
+    __slots__ = ('game', 'position', 'length', 'radius', 'angle', 'angular_velocity', 'swinging', 
+                 'attached_entity', 'gravity', 'vertical_velocity', 'box', 'sin_angle', 'cos_angle', 'end', 'prev_angle')
     
     def __init__(self, game, position: tuple, length: int, radius:int) -> None:
         self.game = game
@@ -21,13 +34,28 @@ class Trapeze:
         self.attached_entity: bool = None
         self.gravity: float = self.GRAVITY 
         self.vertical_velocity: int = self.VERTICAL_VELOCITY 
+        self.box: pygame.Rect = pygame.Rect(0, 0, radius * 2, radius * 2)
+        self.end: list = [0, 0]
+        self.set_angle(self.angle, m.sin(self.angle), m.cos(self.angle))
+        self.prev_angle: float = self.angle
+
+    def set_angle(self, angle: float, sin_angle: float, cos_angle: float) -> None:
+        ''' Sets the angle with its already computed sine and cosine, and caches the end point of the rope '''
+        self.angle = angle
+        self.sin_angle = sin_angle
+        self.cos_angle = cos_angle
+        self.end[0] = self.position[0] + self.length * sin_angle
+        self.end[1] = self.position[1] + self.length * cos_angle
 
     def rect(self) -> pygame.Rect:
-        ''' Returns a pygame Rect representing the trapeze´s current position and size'''
-        
-        end_x: float = self.position[0] + self.length * m.sin(self.angle)
-        end_y: float = self.position[1] + self.length * m.cos(self.angle)
-        return pygame.Rect(end_x - self.radius, end_y - self.radius, self.radius * 2, self.radius * 2)
+        ''' Returns a pygame Rect representing the trapeze´s current position and size, updated in place'''
+        self.box.update(self.end[0] - self.radius, self.end[1] - self.radius, self.radius * 2, self.radius * 2)
+        return self.box
+
+    def swing_rect(self) -> pygame.Rect:
+        ''' Returns a pygame Rect covering every position the trapeze can swing through '''
+        reach = self.length + self.radius
+        return pygame.Rect(self.position[0] - reach, self.position[1] - reach, reach * 2, reach * 2)
 
     def attach_entity(self, entity) -> None:
         ''' Attaches and entity to a trapeze '''
@@ -38,57 +66,102 @@ class Trapeze:
     def detach_entity(self) -> None:
         ''' Detaches any entity currently attached to a trapeze'''
         if self.attached_entity:
-            horizontal_velocity = self.length * self.angular_velocity * m.cos(self.angle)
-            vertical_velocity = -self.length * self.angular_velocity * m.sin(self.angle)
+            horizontal_velocity = self.length * self.angular_velocity * self.cos_angle
+            vertical_velocity = -self.length * self.angular_velocity * self.sin_angle
 
             self.attached_entity.velocity[0] = horizontal_velocity * 2
             self.attached_entity.velocity[1] = vertical_velocity * 2
 
             self.attached_entity = None
             self.swinging = False
+            self.prev_angle = self.angle
 
     def update(self) -> None:
         ''' Updates the state of the trapeze, including its angle and attached entity'''
         if self.swinging and self.attached_entity:            
+            self.prev_angle = self.angle
             self.handle_physics()
             self.handle_gravity()
             self.update_attached_entity()
             
     def handle_physics(self) -> None:
         ''' Handles the physics of the trapeze swing '''
-        g = 0.3 
-        angular_acceleration = -(g / self.length) * m.sin(self.angle)
+        angular_acceleration = -(self.SWING_GRAVITY / self.length) * self.sin_angle
         next_av = (self.angular_velocity + angular_acceleration)
-        top_av = 0.1
-        self.angular_velocity = min(next_av, top_av)
-        self.angle += min(0.3, self.angular_velocity)
+        self.angular_velocity = min(next_av, self.MAX_ANGULAR_VELOCITY)
+        angle = self.angle + min(self.MAX_ANGLE_STEP, self.angular_velocity)
+        self.set_angle(angle, m.sin(angle), m.cos(angle))
         
     def handle_gravity(self) -> None:
         ''' Handles gravity effect on the trapeze and atached entity'''
         self.vertical_velocity = min(3, self.vertical_velocity + self.gravity)
-        if self.attached_entity.collisions['bottom']:
+        if self.attached_entity.collided('bottom'):
             self.vertical_velocity = self.VERTICAL_VELOCITY
             
     def update_attached_entity(self) -> None:
         ''' Updates the position of the entity attached to the trapeze'''
-        attached_x = self.position[0] + self.length * m.sin(self.angle)
-        attached_y = self.position[1] + self.length * m.cos(self.angle)
-
-        self.attached_entity.pos = [attached_x - (self.radius*2), attached_y - self.radius]
+        self.attached_entity.pos = [self.end[0] - (self.radius*2), self.end[1] - self.radius]
             
         
-    def draw(self, surface, offset=(0, 0)) -> None:
-        ''' Draws the trapeze on the specified surface and position '''
-        
-        end_x: float = self.position[0] + self.length * m.sin(self.angle)
-        end_y: float = self.position[1] + self.length * m.cos(self.angle)
+    def draw(self, surface, offset=(0, 0), alpha: float =1.0) -> None:
+        ''' Draws the trapeze on the specified surface and position by blitting the cached sprite closest to its angle,
+        interpolated alpha of the way from the angle before the last update '''
+        sprite, sprite_offset = self.sprite(self.angle - (self.angle - self.prev_angle) * (1 - alpha))
+        x = self.position[0] + sprite_offset[0] - offset[0]
+        y = self.position[1] + sprite_offset[1] - offset[1]
+        if x < surface.get_width() and y < surface.get_height() and x + sprite.get_width() > 0 and y + sprite.get_height() > 0:
+            surface.blit(sprite, (x, y))
 
-        pygame.draw.line(surface, (0, 0, 10), self.calculate_start_position(offset), self.calculate_bottom_position(offset, end_x, end_y), self.LINE_WIDTH)
-        pygame.draw.circle(surface, (30, 0, 0), (round(end_x - offset[0]), round(end_y - offset[1])), self.radius, 2)
+    def sprite(self, angle: float) -> tuple:
+        ''' Returns the (surface, offset from the pivot) sprite for an angle, quantized to SPRITE_STEPS per turn. 
+        Sprites are rendered on first use and shared by every trapeze with the same length and radius '''
+        step = round(angle / (2 * m.pi) * self.SPRITE_STEPS) % self.SPRITE_STEPS
+        key = (self.length, self.radius, step)
+        sprite = Trapeze.sprites.get(key)
+        if sprite is None:
+            sprite = Trapeze.sprites[key] = self.render_sprite(step)
+        return sprite
 
-    
-    def calculate_start_position(self, offset):
-        return (self.position[0] - offset[0], self.position[1] - offset[1])
-    
-    def calculate_bottom_position(self, offset, end_x, end_y):
-        return (end_x - offset[0], end_y - offset[1])
\ No newline at end of file
+    def render_sprite(self, step: int) -> tuple:
+        ''' Helper method to rasterize the rope and ring at a quantized angle, cropped to their bounds '''
+        angle = step * 2 * m.pi / self.SPRITE_STEPS
+        end_x = self.length * m.sin(angle)
+        end_y = self.length * m.cos(angle)
+        margin = self.radius + self.LINE_WIDTH
+        left = m.floor(min(0, end_x)) - margin
+        top = m.floor(min(0, end_y)) - margin
+        width = m.ceil(max(0, end_x)) + margin - left
+        height = m.ceil(max(0, end_y)) + margin - top
+
+        sprite = pygame.Surface((width, height))
+        sprite.fill(self.SPRITE_COLORKEY)
+        sprite.set_colorkey(self.SPRITE_COLORKEY)
+        pygame.draw.line(sprite, (0, 0, 10), (-left, -top), (end_x - left, end_y - top), self.LINE_WIDTH)
+        pygame.draw.circle(sprite, (30, 0, 0), (round(end_x - left), round(end_y - top)), self.radius, 2)
+        return sprite, (left, top)
+
+BATCH_MIN_TRAPEZES = 8
+
+def update_trapezes(trapezes: list) -> None:
+    ''' Updates a group of trapezes. When enough of them are swinging and NumPy is available, their swing is 
+    integrated in one vectorized pass; gravity and the attached entities are still handled per trapeze '''
+    swinging = [trapeze for trapeze in trapezes if trapeze.swinging and trapeze.attached_entity]
+    if np is None or len(swinging) < BATCH_MIN_TRAPEZES:
+        for trapeze in swinging:
+            trapeze.update()
+        return
+
+    length = np.array([trapeze.length for trapeze in swinging], dtype=float)
+    angle = np.array([trapeze.angle for trapeze in swinging])
+    sin_angle = np.array([trapeze.sin_angle for trapeze in swinging])
+    angular_velocity = np.array([trapeze.angular_velocity for trapeze in swinging])
+
+    angular_velocity = np.minimum(angular_velocity - (Trapeze.SWING_GRAVITY / length) * sin_angle, Trapeze.MAX_ANGULAR_VELOCITY)
+    angle = angle + np.minimum(Trapeze.MAX_ANGLE_STEP, angular_velocity)
+
+    for trapeze, av, a, sin_a, cos_a in zip(swinging, angular_velocity.tolist(), angle.tolist(), np.sin(angle).tolist(), np.cos(angle).tolist()):
+        trapeze.prev_angle = trapeze.angle
+        trapeze.angular_velocity = av
+        trapeze.set_angle(a, sin_a, cos_a)
+        trapeze.handle_gravity()
+        trapeze.update_attached_entity()
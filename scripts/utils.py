@@ -1,76 +1,99 @@
-import os
 import pygame
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from atlas import Atlas
 
 BASE_IMG_PATH = 'assets/'
+ATLAS_PATH = BASE_IMG_PATH + 'atlas.png'
+ATLAS_INDEX_PATH = BASE_IMG_PATH + 'atlas.json'
+INTRO_ATLAS_PATH = BASE_IMG_PATH + 'intro_atlas.png'
+INTRO_ATLAS_INDEX_PATH = BASE_IMG_PATH + 'intro_atlas.json'
+# images and image directories packed into the atlases, relative to BASE_IMG_PATH. The intro has its own 
+# atlas so it never waits for the gameplay sprites
+INTRO_IMAGE_SOURCES = ['welcome']
+IMAGE_SOURCES = ['game_over_2.png', 'bg.png', 'tiles/floor', 'tiles/circus', 'balloons', 'tiles/spawners',
+                 'coin/idle', 'monkey/idle', 'clown/idle', 'player/jump', 'player/idle', 'player/walking']
+
+LOADER_WORKERS = 4
 
-def get_assets():
-    assets = {
-            'welcome': load_images('welcome'),
-            'game_over': load_image('game_over_2.png'),
-            'background': load_image('bg.png'),
-            'floor': load_images('tiles/floor'),
-            'circus': load_images('tiles/circus'),
-            'balloons': load_images('balloons'),
-            'spawners': load_images('tiles/spawners'),
-            'coin/idle': Animation(load_images('coin/idle'),10),
-            'monkey/idle': Animation(load_images('monkey/idle'),10),
-            'clown/idle': Animation(load_images('clown/idle'),10),
-            'acrobat/jump': Animation(load_images('player/jump')),
-            'acrobat/idle': Animation(load_images('player/idle')),
-            'acrobat/walking': Animation(load_images('player/walking')),
+def get_assets(lazy: bool =False) -> dict:
+    ''' Returns the assets of the game, decoded on a thread pool. With lazy set it returns right away with lazy 
+    handles instead: the intro atlas is submitted first and never waits for the gameplay one, and an asset 
+    still loading is waited for when it is first used '''
+    pool = ThreadPoolExecutor(max_workers=LOADER_WORKERS)
+    intro_atlas = pool.submit(Atlas, BASE_IMG_PATH, INTRO_IMAGE_SOURCES, INTRO_ATLAS_PATH, INTRO_ATLAS_INDEX_PATH)
+    atlas = pool.submit(Atlas, BASE_IMG_PATH, IMAGE_SOURCES, ATLAS_PATH, ATLAS_INDEX_PATH)
+    sprites = lambda build: pool.submit(lambda: build(atlas.result()))
+    assets = LazyAssets({
+            'welcome': pool.submit(lambda: intro_atlas.result().images('welcome')),
             'music': {
                 'start': './assets/music/Trapeqzirque_start_screen.mp3',
                 'main': './assets/music/Trapeqzirque_main.mp3',
                 'game_over': './assets/music/Trapeqzirque_game_over.mp3'},
-            'sounds': {
+            'sounds': pool.submit(SoundBank, {
                 'collect': './assets/sounds/collect.mp3',
                 'collision':'./assets/sounds/collapse.mp3',
                 'jump':'./assets/sounds/jump.wav',
                 'balloon':'./assets/sounds/balloon.wav',
-            }
-            
-        }
+            }),
+            'game_over': sprites(lambda atlas: atlas.image('game_over_2.png')),
+            'background': sprites(lambda atlas: atlas.image('bg.png')),
+            'floor': sprites(lambda atlas: atlas.images('tiles/floor')),
+            'circus': sprites(lambda atlas: atlas.images('tiles/circus')),
+            'balloons': sprites(lambda atlas: atlas.images('balloons')),
+            'spawners': sprites(lambda atlas: atlas.images('tiles/spawners')),
+            'coin/idle': sprites(lambda atlas: Animation(atlas.images('coin/idle'),10, shared=True)),
+            'monkey/idle': sprites(lambda atlas: Animation(atlas.images('monkey/idle'),10, shared=True)),
+            'clown/idle': sprites(lambda atlas: Animation(atlas.images('clown/idle'),10, shared=True)),
+            'acrobat/jump': sprites(lambda atlas: Animation(atlas.images('player/jump'))),
+            'acrobat/idle': sprites(lambda atlas: Animation(atlas.images('player/idle'))),
+            'acrobat/walking': sprites(lambda atlas: Animation(atlas.images('player/walking'))),
+        })
+    # queued loads still run, the pool just stops accepting new ones
+    pool.shutdown(wait=False)
     
-    return assets
-
-def load_image(path: str) -> pygame.Surface:
-    ''' Loads an image from the specified path '''
-    img = pygame.image.load(BASE_IMG_PATH + path).convert()
-    img.set_colorkey((0, 0 ,0))
-    return img
-
-def load_images(path: str) -> list[pygame.Surface]:
-    ''' Loads all images from an specified directory '''
-    images = []
-    for img_name in sorted(os.listdir(BASE_IMG_PATH + path)):
-        images.append(load_image(path + '/' + img_name))
-    return images
+    return assets if lazy else assets.wait()
 
 def play_sound(game, effectName: str) -> None:
-    effectPath = game.assets['sounds'][effectName]
-    soundEffect = pygame.mixer.Sound(effectPath)
-    soundEffect.set_volume(0.5)
-    soundEffect.play()
+    ''' Plays a sound effect from the preloaded sound bank '''
+    game.assets['sounds'].play(effectName)
+
+def update_shared_animations(assets: dict) -> None:
+    ''' Advances every shared animation timeline by one tick, once for all the entities using it '''
+    for asset in assets.values():
+        if isinstance(asset, Animation) and asset.shared:
+            asset.update()
 
 def play_music(game, song_name: str) -> None:
-    ''' Play the music of the game'''
+    ''' Play the music of the game, if there is a mixer'''
+    if not pygame.mixer.get_init():
+        return
     pygame.mixer.music.load(game.assets['music'][song_name])
     pygame.mixer.music.set_volume(0.1)
     pygame.mixer.music.play(-1)
 
 
 class Animation:
-    ''' Class animation to add movement on elements '''
-    def __init__(self, images: list , img_dur: int=5, loop: bool =True) -> None:
+    ''' Class animation to add movement on elements. Mirrored frames are built once and shared by every copy.
+    A shared looping animation is a single timeline: its copies are SharedAnimation handles that follow it '''
+    def __init__(self, images: list , img_dur: int=5, loop: bool =True, flipped_images: list =None, shared: bool =False) -> None:
         self.images = images
+        self.flipped_images = flipped_images if flipped_images is not None else [pygame.transform.flip(img, True, False) for img in images]
         self.loop = loop
         self.img_duration = img_dur
         self.done = False
         self.frame = 0
+        self.shared = shared and loop
         
-    def copy(self) -> 'Animation':
-        ''' Creates copy of the current Animation object'''
-        return Animation(self.images, self.img_duration, self.loop)
+    def copy(self, offset: int =0) -> 'Animation':
+        ''' Creates copy of the current Animation object starting offset ticks in. 
+        Shared animations return a SharedAnimation handle on this timeline instead'''
+        if self.shared:
+            return SharedAnimation(self, offset)
+        animation = Animation(self.images, self.img_duration, self.loop, self.flipped_images)
+        for _ in range(offset):
+            animation.update()
+        return animation
     
     def update(self) -> None:
         ''' Updates the animation frame. Should be called periodically to animate'''
@@ -81,8 +104,131 @@ class Animation:
             if self.frame >= self.img_duration * len(self.images) - 1:
                 self.done = True
     
-    def img(self) -> pygame.Surface:
-        ''' Gets the current image of the animation '''
-        return self.images[int(self.frame/self.img_duration)]
-    
-    
\ No newline at end of file
+    def img(self, flip: bool =False) -> pygame.Surface:
+        ''' Gets the current image of the animation, mirrored horizontally if flip is set '''
+        images = self.flipped_images if flip else self.images
+        return images[int(self.frame/self.img_duration)]
+
+
+class LazyAssets(dict):
+    ''' Asset dictionary whose values may still be loading. A pending value is waited for on first access and
+    replaced by its result '''
+
+    def __getitem__(self, key: str):
+        value = super().__getitem__(key)
+        if isinstance(value, Future):
+            value = value.result()
+            self[key] = value
+        return value
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return (self[key] for key in self)
+
+    def items(self):
+        return ((key, self[key]) for key in self)
+
+    def ready(self, key: str) -> bool:
+        ''' Whether an asset can be used without waiting '''
+        value = super().__getitem__(key)
+        return not isinstance(value, Future) or value.done()
+
+    def wait(self) -> 'LazyAssets':
+        ''' Waits for every asset to be loaded '''
+        for key in self:
+            self[key]
+        return self
+
+
+class SharedAnimation:
+    ''' Per-entity handle on a shared Animation. It only keeps the timeline and a phase offset in ticks; 
+    the timeline is advanced once per tick for every handle by update_shared_animations '''
+    __slots__ = ('timeline', 'offset')
+
+    def __init__(self, timeline: Animation, offset: int =0) -> None:
+        self.timeline = timeline
+        self.offset = offset
+
+    @property
+    def images(self) -> list:
+        return self.timeline.images
+
+    @property
+    def img_duration(self) -> int:
+        return self.timeline.img_duration
+
+    @property
+    def loop(self) -> bool:
+        return True
+
+    @property
+    def done(self) -> bool:
+        return False
+
+    @property
+    def frame(self) -> int:
+        ''' Current frame of the timeline shifted by this handle´s offset '''
+        return (self.timeline.frame + self.offset) % (self.timeline.img_duration * len(self.timeline.images))
+
+    def copy(self, offset: int =0) -> 'SharedAnimation':
+        ''' Creates another handle on the same timeline '''
+        return SharedAnimation(self.timeline, offset)
+
+    def update(self) -> None:
+        ''' Shared timelines are advanced by update_shared_animations, not per entity '''
+        pass
+
+    def img(self, flip: bool =False) -> pygame.Surface:
+        ''' Gets the current image of the timeline, mirrored horizontally if flip is set '''
+        images = self.timeline.flipped_images if flip else self.timeline.images
+        return images[int(self.frame/self.timeline.img_duration)]
+
+
+class SoundBank:
+    ''' Sound effects decoded once at load time and played through a fixed pool of reserved mixer channels.
+    When every channel is busy the one that started playing first is stolen, and an effect is ignored if it 
+    was already started less than min_interval milliseconds ago. Without an initialized mixer nothing is played '''
+    CHANNELS = 8
+    VOLUME = 0.5
+    MIN_INTERVAL = 60
+
+    def __init__(self, paths: dict, channels: int =CHANNELS, volume: float =VOLUME, min_interval: int =MIN_INTERVAL) -> None:
+        self.paths: dict = paths
+        self.sounds: dict = {}
+        self.channels: list = []
+        self.started: list = []
+        self.last_played: dict = {}
+        self.min_interval: int = min_interval
+        if not pygame.mixer.get_init():
+            return
+        for name, path in paths.items():
+            sound = pygame.mixer.Sound(path)
+            sound.set_volume(volume)
+            self.sounds[name] = sound
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), channels))
+        pygame.mixer.set_reserved(channels)
+        self.channels = [pygame.mixer.Channel(i) for i in range(channels)]
+        self.started = [0] * channels
+
+    def play(self, name: str) -> None:
+        ''' Plays an effect unless it was started too recently '''
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        now = pygame.time.get_ticks()
+        last = self.last_played.get(name)
+        if last is not None and now - last < self.min_interval:
+            return
+        self.last_played[name] = now
+        index = self.free_channel()
+        self.started[index] = now
+        self.channels[index].play(sound)
+
+    def free_channel(self) -> int:
+        ''' Returns the index of an idle channel of the pool, or of the one playing for the longest time '''
+        for index, channel in enumerate(self.channels):
+            if not channel.get_busy():
+                return index
+        return self.started.index(min(self.started))